@@ -1,10 +1,52 @@
 import os
+import socket
 from dotenv import load_dotenv
 
 load_dotenv()
 
+
+def _mapping(value: str) -> dict:
+    """Разбор строки вида "NBot=card,RouteOfRest=dalle" в словарь."""
+    result = {}
+    for item in value.split(","):
+        if "=" in item:
+            key, val = item.split("=", 1)
+            result[key.strip()] = val.strip()
+    return result
+
+
 # OpenAI
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+# batch - тексты для всех платформ строки одним запросом, single - по запросу на платформу
+TEXT_GENERATION_MODE = os.getenv("TEXT_GENERATION_MODE", "batch")
+OPENAI_TEXT_MODEL = os.getenv("OPENAI_TEXT_MODEL", "gpt-4o-mini")
+OPENAI_CHEAP_TEXT_MODEL = os.getenv("OPENAI_CHEAP_TEXT_MODEL", "gpt-4.1-nano")  # При нехватке бюджета
+OPENAI_TEXT_DEADLINE = int(os.getenv("OPENAI_TEXT_DEADLINE", "60"))   # Потом - повтор на дешёвой модели
+# Дублирующие запросы после p95 задержки: максимум доли от всех запросов (0 - выключено)
+HEDGE_MAX_RATIO = float(os.getenv("HEDGE_MAX_RATIO", "0.1"))
+HEDGE_QUANTILE = float(os.getenv("HEDGE_QUANTILE", "0.95"))
+HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))
+HEDGE_IMAGES = os.getenv("HEDGE_IMAGES", "0") == "1"         # Дубли DALL-E (каждая картинка платная)
+
+# Бюджет OpenAI, USD (0 - без ограничения)
+USAGE_DB_FILE = os.getenv("USAGE_DB_FILE", "temp/usage.db")
+DAILY_BUDGET_USD = float(os.getenv("DAILY_BUDGET_USD", "0"))
+MONTHLY_BUDGET_USD = float(os.getenv("MONTHLY_BUDGET_USD", "0"))
+BUDGET_SOFT_RATIO = float(os.getenv("BUDGET_SOFT_RATIO", "0.8"))        # С этой доли - экономный режим
+BUDGET_THROTTLE_SECONDS = int(os.getenv("BUDGET_THROTTLE_SECONDS", "30"))  # Пауза между заданиями
+
+# Изображения: dalle - DALL-E 3, card - локальная карточка (Pillow)
+IMAGE_BACKEND = os.getenv("IMAGE_BACKEND", "dalle")
+PROJECT_IMAGE_BACKENDS = _mapping(os.getenv("PROJECT_IMAGE_BACKENDS", ""))  # NBot=card
+IMAGE_FALLBACK = os.getenv("IMAGE_FALLBACK", "1") == "1"      # Карточка, если DALL-E не ответил
+DALLE_TIMEOUT = int(os.getenv("DALLE_TIMEOUT", "60"))
+DALLE_MAX_FAILURES = int(os.getenv("DALLE_MAX_FAILURES", "3"))          # Ошибок подряд до паузы
+DALLE_COOLDOWN_SECONDS = int(os.getenv("DALLE_COOLDOWN_SECONDS", "300"))
+CARD_FONT = os.getenv("CARD_FONT", "")                        # TTF с кириллицей
+# Альбомы: картинок в посте по умолчанию и по проектам (в строке таблицы - dalle:4)
+ALBUM_SIZE = int(os.getenv("ALBUM_SIZE", "1"))
+PROJECT_ALBUM_SIZES = {k: int(v) for k, v in _mapping(os.getenv("PROJECT_ALBUM_SIZES", "")).items()}
+DALLE_CONCURRENCY = int(os.getenv("DALLE_CONCURRENCY", "4"))  # Одновременных запросов к DALL-E
 
 # Telegram
 TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
@@ -13,7 +55,62 @@ TELEGRAM_CHANNEL_ID = os.getenv("TELEGRAM_CHANNEL_ID")
 # Google Sheets
 GOOGLE_SHEETS_ID = os.getenv("GOOGLE_SHEETS_ID")
 GOOGLE_CREDENTIALS_FILE = os.getenv("GOOGLE_CREDENTIALS_FILE", "config/google_credentials.json")
+SHEETS_POOL_SIZE = int(os.getenv("SHEETS_POOL_SIZE", "4"))   # Одновременных запросов к Sheets
+SHEETS_TIMEOUT = int(os.getenv("SHEETS_TIMEOUT", "30"))       # Таймаут запроса, секунды
+
+# Очередь заданий: веса проектов (доля обработки), максимум одновременных
+# заданий проекта, потоков обработки (больше 1 - задания параллельно)
+PROJECT_WEIGHTS = {k: float(v) for k, v in _mapping(os.getenv("PROJECT_WEIGHTS", "")).items()}
+PROJECT_CONCURRENCY = {k: int(v) for k, v in _mapping(os.getenv("PROJECT_CONCURRENCY", "")).items()}
+TASK_WORKERS = int(os.getenv("TASK_WORKERS", "1"))
+
+# Задания из файла JSONL/CSV вместо Google Sheets (пусто - таблица, --source переопределяет)
+TASK_SOURCE = os.getenv("TASK_SOURCE", "")
+SOURCE_BATCH = int(os.getenv("SOURCE_BATCH", "50"))         # Заданий файла в памяти за раз
+
+# Несколько воркеров на одну таблицу (аренда строк)
+WORKER_ID = os.getenv("WORKER_ID", f"{socket.gethostname()}-{os.getpid()}")
+LEASE_SECONDS = int(os.getenv("LEASE_SECONDS", "900"))      # Срок аренды строки
+LEASE_BATCH = int(os.getenv("LEASE_BATCH", "5"))            # Строк за один захват
+WORKER_PROJECTS = [p.strip() for p in os.getenv("WORKER_PROJECTS", "").split(",") if p.strip()]
+WORKER_SHARD = os.getenv("WORKER_SHARD", "")                # "i/n" - шард проектов
 
 # Instagram
 INSTAGRAM_USERNAME = os.getenv("INSTAGRAM_USERNAME")
 INSTAGRAM_PASSWORD = os.getenv("INSTAGRAM_PASSWORD")
+# Облегчённый браузер: блокировка медиа/шрифтов/трекеров, без фоновых служб
+INSTAGRAM_LEAN_BROWSER = os.getenv("INSTAGRAM_LEAN_BROWSER", "1") == "1"
+INSTAGRAM_JS_HEAP_MB = int(os.getenv("INSTAGRAM_JS_HEAP_MB", "512"))   # Лимит памяти JS рендерера
+
+# Повторы тем: off - не проверять, flag - только предупреждать,
+# skip - не публиковать (статус duplicate), reuse - взять контент прошлого поста
+DEDUP_MODE = os.getenv("DEDUP_MODE", "flag")
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.6"))
+TOPIC_INDEX_FILE = os.getenv("TOPIC_INDEX_FILE", "temp/topic_index.jsonl")
+
+# Контент, сохранённый до публикации на всех платформах строки
+CONTENT_CACHE_DIR = os.getenv("CONTENT_CACHE_DIR", "temp/content")
+
+# Таймауты подключения к сервисам при старте, секунды (sheets, openai, tg, ig)
+CONNECT_TIMEOUTS = {
+    "sheets": 30, "openai": 30, "tg": 30, "ig": 180,
+    **{k: int(v) for k, v in _mapping(os.getenv("CONNECT_TIMEOUTS", "")).items()},
+}
+
+# Метрики
+METRICS_FILE = os.getenv("METRICS_FILE", "")                  # Prometheus textfile
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))            # HTTP /metrics (только --schedule)
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_SUMMARY_FILE = os.getenv("METRICS_SUMMARY_FILE", "")  # JSON-сводка запуска
+
+# Планировщик (--schedule)
+SCHEDULE_INTERVAL_MINUTES = int(os.getenv("SCHEDULE_INTERVAL_MINUTES", "5"))
+
+# Профилирование (--profile)
+PROFILE_DIR = os.getenv("PROFILE_DIR", "temp/profile")
+PROFILE_SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL", "0.01"))  # Сэмплер стеков, секунды
+
+# HTTP API заданий (только --schedule)
+API_PORT = int(os.getenv("API_PORT", "0"))                    # 0 - выключен
+API_HOST = os.getenv("API_HOST", "127.0.0.1")
+API_TOKEN = os.getenv("API_TOKEN", "")                        # Authorization: Bearer <токен>
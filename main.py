@@ -2,18 +2,23 @@
 """
 AutoPost - Автоматический постинг в социальные сети.
 
-Читает задания из Google Sheets, генерирует контент через OpenAI,
-и публикует в указанные платформы.
+Читает задания из Google Sheets (или из файла JSONL/CSV), генерирует
+контент через OpenAI, и публикует в указанные платформы.
 
 Использование:
     python main.py              # Обработать все pending задания
     python main.py --test       # Тестовый режим (без публикации)
-    python main.py --schedule   # Запуск по расписанию (каждые 5 минут)
+    python main.py --schedule   # Запуск по расписанию (каждые 5 минут) + HTTP API заданий
+    python main.py --source tasks.jsonl  # Задания из файла вместо таблицы
 """
 
 import argparse
+import json
 import os
 import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
 # Добавляем корневую директорию в путь
@@ -24,40 +29,206 @@ from services.sheets import SheetsService
 from services.generator import ContentGenerator
 from services.publishers.telegram import TelegramPublisher
 from services.publishers.instagram import InstagramPublisher
+from services.metrics import metrics
+from services.dedup import TopicIndex
+from services.content_cache import ContentCache
+from services.metering import BUDGET_NORMAL, BUDGET_CHEAP, BUDGET_EXHAUSTED
+from services.startup import ServiceStartup
+from services.api import JobQueue
+from services.fair_queue import FairQueue
+from services.profiling import profiler
+from services.task_source import FileTaskSource, JobTaskSource, SheetsTaskSource
+from config.settings import (
+    METRICS_FILE, METRICS_PORT, METRICS_HOST, METRICS_SUMMARY_FILE, SCHEDULE_INTERVAL_MINUTES,
+    WORKER_ID, LEASE_SECONDS, LEASE_BATCH, WORKER_PROJECTS, WORKER_SHARD,
+    DEDUP_MODE, DEDUP_THRESHOLD, TOPIC_INDEX_FILE, BUDGET_THROTTLE_SECONDS, CONTENT_CACHE_DIR,
+    CONNECT_TIMEOUTS, API_PORT, API_HOST, API_TOKEN,
+    PROJECT_WEIGHTS, PROJECT_CONCURRENCY, TASK_WORKERS, PROFILE_DIR, PROFILE_SAMPLE_INTERVAL,
+    TASK_SOURCE, SOURCE_BATCH,
+)
 
 
 class AutoPost:
     """Главный класс приложения."""
 
+    # Платформы, для которых есть публикатор
+    SUPPORTED_PLATFORMS = ('tg', 'ig')
+
     def __init__(self):
         self.sheets = SheetsService()
         self.generator = ContentGenerator()
         self.telegram = TelegramPublisher()
         self.instagram = InstagramPublisher()
+        self.topics = TopicIndex(TOPIC_INDEX_FILE, DEDUP_THRESHOLD)
+        self.content_cache = ContentCache(CONTENT_CACHE_DIR)
+        self.startup = ServiceStartup()
+        # Источник заданий (TaskSource): таблица или файл (режим --source)
+        self.source = SheetsTaskSource(
+            self.sheets, WORKER_ID, LEASE_SECONDS, LEASE_BATCH, projects=WORKER_PROJECTS, shard=WORKER_SHARD,
+        )
+        # Задания из HTTP API (JobTaskSource, только в режиме --schedule)
+        self.jobs = None
+        # В режиме --schedule браузер и соединения держим между запусками
+        self.keep_connected = False
+        # Публикация на платформу - по одному заданию (один браузер, один бот)
+        self._publish_locks = {platform: threading.Lock() for platform in self.SUPPORTED_PLATFORMS}
+        if DEDUP_MODE != 'off':
+            self.topics.load()
 
     def connect_all(self) -> bool:
-        """Подключение ко всем сервисам."""
+        """
+        Подключение ко всем сервисам.
+
+        Сервисы подключаются одновременно, каждый со своим таймаутом и
+        проверкой. Ждём только источник заданий (таблицу или файл) и OpenAI -
+        без них задания не прочитать и не сгенерировать. Платформы
+        подключаются в фоне: публикация на платформу начинается, как только
+        она готова. Браузер Instagram запускается, только когда он нужен
+        заданию (см. start_platforms).
+        """
         print("\n=== Подключение к сервисам ===\n")
-
-        # Google Sheets
-        if not self.sheets.connect():
-            print("[!] Google Sheets недоступен, продолжаем без него")
+        # Уже запускавшиеся платформы (режим --schedule) проверяем заново
+        platforms = ['tg'] + [p for p in self.SUPPORTED_PLATFORMS if p != 'tg' and self.startup.started(p)]
+        self.startup.start(self.source.service, self.source.connect,
+                           timeout=CONNECT_TIMEOUTS.get(self.source.service, 60))
+        self.start_services(['openai'] + platforms)
+
+        # Источник заданий
+        if not self.startup.wait(self.source.service):
+            if self.jobs is None:
+                print(f"[ОШИБКА] Источник заданий недоступен: {self.source.name}")
+                return False
+            print(f"[!] {self.source.name} недоступен, продолжаем с заданиями из API")
 
         # OpenAI
-        if not self.generator.connect():
+        if not self.startup.wait('openai'):
             print("[!] OpenAI недоступен")
             return False
 
-        # Telegram
-        if not self.telegram.connect():
-            print("[!] Telegram недоступен")
-            return False
+        print("\n=== Сервисы подключены (платформы подключаются в фоне) ===\n")
+        return True
+
+    def start_services(self, names: list):
+        """Начать подключение сервисов в фоне (с проверкой каждого)."""
+        services = {
+            'openai': self.generator,
+            'tg': self.telegram,
+            'ig': self.instagram,
+        }
+        for name in names:
+            service = services[name]
+            self.startup.start(name, service.connect, service.health_check, CONNECT_TIMEOUTS.get(name, 60))
+
+    def start_platforms(self, tasks: list):
+        """Начать подключение платформ, которые нужны заданиям и ещё не подключались."""
+        needed = {p.strip().lower() for task in tasks for p in task['platforms']}
+        self.start_services([p for p in self.SUPPORTED_PLATFORMS if p in needed and not self.startup.started(p)])
+
+    def platforms_ready(self, task: dict) -> bool:
+        """Все платформы задания уже подключены."""
+        platforms = [p.strip().lower() for p in task['platforms'] if p.strip()]
+        return all(self.startup.ready(p) for p in platforms if p in self.SUPPORTED_PLATFORMS)
+
+    # Статусы пишутся в источник задания (ключ 'source'). Без источника
+    # (--single, тестовый режим) задание только выполняется.
+
+    def set_status(self, task: dict, status: str, post_id: str = None):
+        """Записать итоговый статус задания (дальше источник его не держит)."""
+        if task.get('source'):
+            task['source'].update_status(task, status, post_id)
+            task['source'] = None
+
+    def save_platform_status(self, task: dict, states: dict):
+        """Записать статусы по платформам."""
+        if task.get('source'):
+            task['source'].update_platform_status(task, states)
+
+    def release_task(self, task: dict):
+        """
+        Задание не выполнено - вернуть его к следующему запуску: строку
+        таблицы в pending, задание файла - в отложенные, задание API - в очередь.
+        """
+        if task.get('source'):
+            task['source'].release(task)
+            task['source'] = None
+
+    def keep_lease(self, task: dict) -> bool:
+        """Продлить аренду задания. False - его забрал другой воркер."""
+        return not task.get('source') or task['source'].renew(task)
+
+    def find_duplicate(self, project: str, topic: str):
+        """Найти похожую опубликованную тему проекта (None, если повторов нет или проверка выключена)."""
+        if DEDUP_MODE == 'off':
+            return None
+
+        found = self.topics.find(project, topic)
+        if not found:
+            return None
+
+        entry, score = found
+        print(f"[!] Похожая тема уже была ({score:.0%}): \"{entry['topic']}\" от {entry['created']}")
+        return entry
+
+    def reuse_contents(self, entry: dict, project: str, topic: str, targets: list, image: str = '') -> dict:
+        """
+        Контент на основе прошлого поста с похожей темой: готовые тексты и
+        картинка берутся из индекса, генерируется только недостающее.
+        """
+        texts = {p: entry['texts'][p] for p in targets if entry['texts'].get(p)}
+        missing = [p for p in targets if p not in texts]
+        if missing:
+            texts.update(self.generator.generate_texts(project, topic, missing))
+
+        image_paths = self.saved_images(entry, project, topic, image)
+
+        print(f"[OK] Использован контент прошлого поста (сгенерировано заново: {', '.join(missing) or 'ничего'})")
+        return self.build_contents(targets, texts, image_paths)
+
+    def saved_images(self, saved: dict, project: str, topic: str, image: str = '') -> list:
+        """
+        Картинки, сохранённые ранее (кэш или индекс тем). Если файлов уже
+        нет или их меньше, чем нужно для альбома, картинки генерируются заново.
+        """
+        backend, count = self.generator.image_spec(project, image)
+        paths = saved.get('image_paths') or [saved.get('image_path', '')]
+        paths = [p for p in paths if p and os.path.exists(p)]
+        if paths and (len(paths) >= count or self.generator.image_backend(project, backend) == 'card'):
+            return paths[:count]
+        return self.generator.generate_images(project, topic, backend, count)
+
+    @staticmethod
+    def build_contents(targets: list, texts: dict, image_paths: list) -> dict:
+        """Контент по платформам: свой текст и общие картинки."""
+        return {
+            p: {
+                'text': texts.get(p, ''),
+                'image_path': image_paths[0] if image_paths else '',
+                'image_paths': image_paths,
+            }
+            for p in targets
+        }
+
+    def check_budget(self, task: dict) -> bool:
+        """
+        Учесть бюджет OpenAI перед заданием.
+
+        Бюджет почти исчерпан - пауза между заданиями и откладываем задания
+        с низким приоритетом. Исчерпан - выполняем только высокий приоритет.
 
-        # Instagram (опционально - если настроен)
-        if not self.instagram.connect():
-            print("[!] Instagram недоступен, продолжаем без него")
+        Returns:
+            False, если задание нужно отложить
+        """
+        state = self.generator.meter.budget_state()
+        if state == BUDGET_NORMAL:
+            return True
 
-        print("\n=== Все сервисы подключены ===\n")
+        priority = task.get('priority', 'normal')
+        if (state == BUDGET_CHEAP and priority == 'low') or (state == BUDGET_EXHAUSTED and priority != 'high'):
+            print(f"[!] Бюджет OpenAI: режим {state}, задание с приоритетом '{priority}' отложено")
+            return False
+
+        print(f"[!] Бюджет OpenAI: режим {state}, пауза {BUDGET_THROTTLE_SECONDS} сек.")
+        time.sleep(BUDGET_THROTTLE_SECONDS)
         return True
 
     def process_task(self, task: dict, test_mode: bool = False) -> bool:
@@ -67,66 +238,180 @@ class AutoPost:
         Args:
             task: Задание из Google Sheets
             test_mode: Если True, не публикуем и не обновляем статус
+
+        Returns:
+            False, если задание отложено до следующего запуска (бюджет,
+            не подключилась платформа)
         """
         project = task['project']
         topic = task['topic']
-        platforms = task['platforms']
-        row_number = task.get('row_number')
+        platforms = [p.strip().lower() for p in task['platforms'] if p.strip()]
 
         print(f"\n--- Обработка задания ---")
         print(f"Проект: {project}")
         print(f"Тема: {topic}")
         print(f"Платформы: {', '.join(platforms)}")
 
-        # Генерируем контент
-        for platform in platforms:
-            platform = platform.strip().lower()
-
-            if platform == 'tg':
-                content = self.generator.generate_content(project, topic, 'tg')
-
-                if test_mode:
-                    print(f"\n[ТЕСТ] Текст ({len(content['text'])} символов):")
-                    print(content['text'][:300] + "..." if len(content['text']) > 300 else content['text'])
-                    print(f"[ТЕСТ] Изображение: {content['image_path']}")
-                else:
-                    # Публикуем в Telegram
-                    result = self.telegram.publish(
-                        text=content['text'],
-                        image_path=content['image_path']
-                    )
-
-                    if result['success'] and row_number:
-                        self.sheets.update_status(row_number, 'done', result['post_id'])
-                    elif row_number:
-                        self.sheets.update_status(row_number, 'error')
-
-            elif platform == 'ig':
-                content = self.generator.generate_content(project, topic, 'ig')
-
-                if test_mode:
-                    print(f"\n[ТЕСТ] Текст для Instagram ({len(content['text'])} символов):")
-                    print(content['text'][:300] + "..." if len(content['text']) > 300 else content['text'])
-                    print(f"[ТЕСТ] Изображение: {content['image_path']}")
-                else:
-                    if not self.instagram.logged_in:
-                        print("[ОШИБКА] Instagram не подключен, пропускаем")
-                        continue
-
-                    # Публикуем в Instagram
-                    result = self.instagram.publish(
-                        text=content['text'],
-                        image_path=content['image_path']
-                    )
-
-                    if result['success'] and row_number:
-                        self.sheets.update_status(row_number, 'done', result['post_id'])
-                    elif row_number:
-                        self.sheets.update_status(row_number, 'error')
-
-            # TODO: Добавить обработку 'tt' (TikTok) в следующих фазах
+        if not self.check_budget(task):
+            # Задание остаётся до следующего запуска
+            self.release_task(task)
+            return False
 
-        return True
+        # Пока задание ждало в очереди, аренда могла истечь и строку мог
+        # забрать другой воркер - проверяем до запросов к OpenAI
+        if not self.keep_lease(task):
+            print("[!] Строку забрал другой воркер, пропускаем")
+            return False
+
+        # Не генерируем контент для платформ, куда всё равно не опубликуем
+        targets = [p for p in platforms if p in self.SUPPORTED_PLATFORMS]
+        if not targets:
+            # Публикатора нет ни для одной платформы - повтор ничего не изменит
+            print(f"[ОШИБКА] Нет публикатора ни для одной платформы: {', '.join(platforms)}")
+            task['error'] = 'нет платформ для публикации'
+            if test_mode:
+                self.release_task(task)
+            else:
+                self.set_status(task, 'error')
+            return True
+
+        # Не подключившиеся платформы не получают статус error: задание
+        # возвращается в очередь и они повторяются при следующем запуске
+        unavailable = []
+        if not test_mode:
+            unavailable = [p for p in targets if not self.startup.available(p)]
+            for platform in unavailable:
+                print(f"[!] Платформа {platform} не подключена, повторим при следующем запуске")
+                targets.remove(platform)
+
+        # Платформы, где пост уже опубликован (после частичной ошибки), пропускаем
+        states = dict(task.get('platform_status') or {})
+        done = [p for p in targets if states.get(p, {}).get('status') == 'done']
+        targets = [p for p in targets if p not in done]
+        if done:
+            print(f"[OK] Уже опубликовано: {', '.join(done)} - пропускаем")
+        if not targets:
+            if done and not unavailable and not test_mode:
+                self.finish_task(task, states, platforms)
+            else:
+                self.release_task(task)
+            return not unavailable
+
+        # Похожая тема уже публиковалась?
+        duplicate = None if done else self.find_duplicate(project, topic)
+        if duplicate and DEDUP_MODE == 'skip':
+            print("[!] Пропускаем повтор темы")
+            if test_mode:
+                self.release_task(task)
+            else:
+                self.set_status(task, 'duplicate')
+            return True
+
+        contents = self.prepare_contents(task, targets, duplicate, test_mode)
+
+        published = False
+        # Сначала платформы, которые уже подключены
+        for platform in sorted(targets, key=lambda p: not self.startup.ready(p)):
+            content = contents[platform]
+
+            if test_mode:
+                label = {'tg': 'Текст', 'ig': 'Текст для Instagram'}[platform]
+                print(f"\n[ТЕСТ] {label} ({len(content['text'])} символов):")
+                print(content['text'][:300] + "..." if len(content['text']) > 300 else content['text'])
+                print(f"[ТЕСТ] Изображения: {', '.join(content['image_paths']) or 'нет'}")
+                continue
+
+            if not self.startup.wait(platform):
+                print(f"[!] Платформа {platform} не подключена, повторим при следующем запуске")
+                unavailable.append(platform)
+                continue
+            if not self.keep_lease(task):
+                return False
+            result = self.publish(project, platform, content)
+
+            states[platform] = {
+                'status': 'done' if result['success'] else 'error',
+                'post_id': result['post_id'],
+            }
+            published = published or result['success']
+            self.save_platform_status(task, states)
+
+        # TODO: Добавить обработку 'tt' (TikTok) в следующих фазах
+
+        # Запоминаем тему, чтобы находить её повторы
+        if published and DEDUP_MODE != 'off':
+            self.topics.add(project, topic, contents)
+
+        if not test_mode and states and not unavailable:
+            self.finish_task(task, states, platforms)
+
+        # Итоговый статус не записан - возвращаем задание в очередь
+        # (статусы опубликованных платформ сохранены, повтора не будет)
+        self.release_task(task)
+
+        return not unavailable
+
+    def prepare_contents(self, task: dict, targets: list, duplicate: dict = None,
+                         test_mode: bool = False) -> dict:
+        """
+        Контент для платформ задания.
+
+        Сначала берётся контент, сохранённый при прошлой попытке этой строки,
+        затем (DEDUP_MODE=reuse) - контент похожего прошлого поста. Генерируется
+        только то, чего не хватает.
+        """
+        project = task['project']
+        topic = task['topic']
+        image = task.get('image', '')
+
+        cached = self.content_cache.get(project, topic)
+        if cached:
+            texts = {p: cached['texts'][p] for p in targets if cached['texts'].get(p)}
+            missing = [p for p in targets if p not in texts]
+            if missing:
+                texts.update(self.generator.generate_texts(project, topic, missing))
+            image_paths = self.saved_images(cached, project, topic, image)
+            print(f"[OK] Использован контент прошлой попытки (сгенерировано заново: {', '.join(missing) or 'ничего'})")
+            contents = self.build_contents(targets, texts, image_paths)
+        elif duplicate and DEDUP_MODE == 'reuse':
+            contents = self.reuse_contents(duplicate, project, topic, targets, image)
+        else:
+            # Генерируем контент сразу для всех платформ
+            backend, count = self.generator.image_spec(project, image)
+            contents = self.generator.generate_contents(project, topic, targets, backend, count)
+
+        if not test_mode:
+            self.content_cache.put(project, topic, contents)
+        return contents
+
+    def publish(self, project: str, platform: str, content: dict) -> dict:
+        """Публикация на одной платформе."""
+        publisher = {'tg': self.telegram, 'ig': self.instagram}[platform]
+
+        with self._publish_locks[platform], metrics.span('publish', project, platform) as span:
+            result = publisher.publish(
+                text=content['text'],
+                image_path=content['image_path'],
+                image_paths=content.get('image_paths'),
+            )
+            if not result['success']:
+                span.fail()
+        return result
+
+    def finish_task(self, task: dict, states: dict, platforms: list):
+        """
+        Итоговый статус строки по статусам платформ: done - опубликовано
+        везде, error - где-то не получилось (при повторе будут
+        обработаны только эти платформы).
+        """
+        targets = [p for p in platforms if p in self.SUPPORTED_PLATFORMS]
+        all_done = all(states.get(p, {}).get('status') == 'done' for p in targets)
+        post_id = next((states[p]['post_id'] for p in targets
+                        if states.get(p, {}).get('status') == 'done' and states[p].get('post_id')), None)
+
+        self.set_status(task, 'done' if all_done else 'error', post_id)
+        if all_done:
+            self.content_cache.drop(task['project'], task['topic'])
 
     def run(self, test_mode: bool = False):
         """Запуск обработки всех pending заданий."""
@@ -138,29 +423,187 @@ class AutoPost:
         if test_mode:
             print("Режим: ТЕСТОВЫЙ (без публикации)")
 
+        metrics.start_run()
+        self.generator.meter.start_run()
+
         if not self.connect_all():
             print("\n[ОШИБКА] Не удалось подключиться к сервисам")
+            if not self.keep_connected:
+                self.close_browser()
             return
 
-        # Получаем задания из таблицы
-        tasks = self.sheets.get_pending_tasks()
+        processed = self.process_source(test_mode) if self.startup.ready(self.source.service) else 0
+
+        # Закрываем браузер Instagram
+        if not self.keep_connected:
+            self.close_browser()
 
-        if not tasks:
+        if not processed:
             print("\n[INFO] Нет заданий для обработки")
+            self.export_metrics()
             return
 
-        # Обрабатываем каждое задание
-        for task in tasks:
-            self.process_task(task, test_mode)
-
-        # Закрываем браузер Instagram
-        self.instagram.disconnect()
-
         print("\n" + "=" * 50)
         print("   Обработка завершена")
-        print("=" * 50 + "\n")
+        print("=" * 50)
+        print(self.generator.meter.format_summary() + "\n")
+
+        self.export_metrics()
+
+    def process_source(self, test_mode: bool = False) -> int:
+        """
+        Обработка заданий источника пачками: следующая пачка берётся, когда
+        выполнена текущая. Строки таблицы берутся в аренду, поэтому несколько
+        процессов могут работать с одной таблицей без повторных публикаций;
+        из файла в памяти не больше одной пачки при любом его размере.
+
+        Пачка выбирается из всех доступных заданий справедливо по проектам
+        (см. FairQueue), если источник это умеет (таблица).
+
+        Статусы пишутся в источник, из которого пришло задание (ключ
+        'source'); в тестовом режиме источник только читается.
+
+        Returns:
+            Количество обработанных заданий
+        """
+        queue = self.new_queue()
+        processed = 0
+        for batch in self.source.batches(select=queue.pick, readonly=test_mode):
+            if not test_mode:
+                self.start_platforms(batch)
+            for task in batch:
+                task['source'] = None if test_mode else self.source
+                queue.push(task)
+            processed += len(self.run_queue(queue, test_mode))
+        return processed
+
+    @staticmethod
+    def new_queue() -> FairQueue:
+        """Справедливая очередь заданий по проектам (веса и ограничения из настроек)."""
+        return FairQueue(PROJECT_WEIGHTS, PROJECT_CONCURRENCY)
+
+    def run_queue(self, queue: FairQueue, test_mode: bool = False) -> list:
+        """
+        Выполнить все задания очереди в TASK_WORKERS потоков.
+
+        Returns:
+            Выполненные задания
+        """
+        finished = []
+
+        def worker():
+            while True:
+                # Сначала задания, все платформы которых уже подключены
+                task = queue.pop(defer=lambda t: not test_mode and not self.platforms_ready(t))
+                if task is None:
+                    return
+                try:
+                    with profiler.thread():
+                        self.process_task(task, test_mode)
+                except Exception as e:
+                    print(f"[ОШИБКА] Задание {task['project']} / {task['topic']}: {e}")
+                    # Задание не должно держать аренду или контрольную точку источника
+                    self.release_task(task)
+                finally:
+                    queue.done(task)
+                    profiler.checkpoint(f"task {task['project']}: {task['topic'][:40]}")
+                finished.append(task)
+                # Задания из API не ждут, пока закончится вся таблица, и
+                # встают в ту же очередь (веса, ограничения и приоритеты проектов)
+                self.pull_jobs(queue, test_mode=test_mode)
+
+        if TASK_WORKERS <= 1:
+            worker()
+        else:
+            with ThreadPoolExecutor(max_workers=TASK_WORKERS, thread_name_prefix='task') as pool:
+                for future in [pool.submit(worker) for _ in range(TASK_WORKERS)]:
+                    future.result()
+        return finished
+
+    def process_jobs(self, test_mode: bool = False, wait: float = 0) -> int:
+        """
+        Обработать задания из HTTP API, время публикации которых наступило
+        (через справедливую очередь, как строки таблицы).
+
+        Args:
+            wait: Сколько ждать первого задания, секунды
 
-    def run_single(self, project: str, topic: str, platform: str = 'tg', test_mode: bool = False):
+        Returns:
+            Количество обработанных заданий
+        """
+        queue = self.new_queue()
+        if not self.pull_jobs(queue, wait, test_mode):
+            return 0
+        return len(self.run_queue(queue, test_mode))
+
+    def pull_jobs(self, queue: FairQueue, wait: float = 0, test_mode: bool = False) -> int:
+        """
+        Переложить задания из HTTP API, время публикации которых наступило,
+        в очередь заданий.
+
+        Args:
+            wait: Сколько ждать первого задания, секунды
+
+        Returns:
+            Количество добавленных заданий
+        """
+        if self.jobs is None or not self.startup.ready('openai'):
+            time.sleep(wait)
+            return 0
+
+        count = 0
+        for task in self.jobs.tasks(wait=wait):
+            if not test_mode:
+                self.start_platforms([task])
+            task['source'] = self.jobs
+            queue.push(task)
+            count += 1
+        return count
+
+    def export_metrics(self):
+        """Вывести JSON-сводку запуска и сохранить метрики в файлы."""
+        try:
+            if METRICS_SUMMARY_FILE:
+                summary = metrics.write_run_summary(METRICS_SUMMARY_FILE)
+            else:
+                summary = metrics.run_summary()
+            print(f"[METRICS] {json.dumps(summary, ensure_ascii=False)}")
+
+            if METRICS_FILE:
+                metrics.write_prometheus(METRICS_FILE)
+        except Exception as e:
+            print(f"[ОШИБКА] Не удалось сохранить метрики: {e}")
+
+        profiler.checkpoint('run')
+
+    def run_daemon(self, test_mode: bool = False, interval_minutes: int = SCHEDULE_INTERVAL_MINUTES):
+        """Запуск по расписанию: обработка заданий каждые N минут."""
+        import schedule
+
+        self.keep_connected = True
+        if profiler.enabled:
+            profiler.install_signal()
+        if METRICS_PORT:
+            metrics.serve(METRICS_PORT, METRICS_HOST)
+        if API_PORT:
+            self.jobs = JobTaskSource(JobQueue(), SCHEDULE_INTERVAL_MINUTES * 60, test_mode)
+            self.jobs.queue.serve(API_PORT, API_HOST, API_TOKEN)
+
+        print(f"[OK] Запуск по расписанию: каждые {interval_minutes} мин.")
+        schedule.every(interval_minutes).minutes.do(self.run, test_mode=test_mode)
+        self.run(test_mode)
+
+        try:
+            while True:
+                schedule.run_pending()
+                # Между запусками ждём задания из API (подхватываются за доли секунды)
+                self.process_jobs(test_mode, wait=0.5)
+        except KeyboardInterrupt:
+            print("\n[OK] Остановка по Ctrl+C")
+            self.close_browser()
+
+    def run_single(self, project: str, topic: str, platform: str = 'tg', test_mode: bool = False,
+                   image: str = ''):
         """
         Запуск для одного поста без Google Sheets.
         Удобно для быстрого тестирования.
@@ -169,49 +612,78 @@ class AutoPost:
         print("   AutoPost - Одиночный пост")
         print("=" * 50)
 
-        if not self.generator.connect():
+        # OpenAI и платформа подключаются одновременно
+        services = ['openai'] if test_mode or platform not in self.SUPPORTED_PLATFORMS else ['openai', platform]
+        self.start_services(services)
+        if not all(self.startup.wait(name) for name in services):
+            self.close_browser()
             return
 
-        # Подключаем нужную платформу
-        if not test_mode:
-            if platform == 'tg' and not self.telegram.connect():
-                return
-            elif platform == 'ig' and not self.instagram.connect():
-                return
-
         task = {
             'project': project,
             'topic': topic,
             'platforms': [platform],
+            'image': image,
         }
 
         self.process_task(task, test_mode)
 
         # Закрываем браузер Instagram если использовался
         if platform == 'ig':
-            self.instagram.disconnect()
+            self.close_browser()
+
+    def close_browser(self):
+        """
+        Закрыть браузер Instagram. Если браузер ещё запускается в фоне,
+        сначала дожидаемся подключения (не дольше его таймаута) - иначе
+        Chrome, запущенный после закрытия, останется висеть без владельца.
+        """
+        self.startup.join('ig', CONNECT_TIMEOUTS.get('ig', 60))
+        self.instagram.disconnect()
 
 
 def main():
     parser = argparse.ArgumentParser(description='AutoPost - Автоматический постинг')
     parser.add_argument('--test', action='store_true', help='Тестовый режим (без публикации)')
     parser.add_argument('--single', action='store_true', help='Одиночный пост')
+    parser.add_argument('--schedule', action='store_true',
+                        help=f'Запуск по расписанию (каждые {SCHEDULE_INTERVAL_MINUTES} минут)')
     parser.add_argument('--project', type=str, default='RouteOfRest', help='Проект для --single')
     parser.add_argument('--topic', type=str, help='Тема для --single')
     parser.add_argument('--platform', type=str, default='tg', choices=['tg', 'ig', 'tt'],
                         help='Платформа для --single: tg (Telegram), ig (Instagram), tt (TikTok)')
+    parser.add_argument('--image', type=str, default='', choices=['', 'dalle', 'card'],
+                        help='Картинка для --single: dalle (DALL-E 3) или card (локальная карточка)')
+    parser.add_argument('--images', type=int, default=0,
+                        help='Картинок в посте для --single (больше 1 - альбом)')
+    parser.add_argument('--source', type=str, default=TASK_SOURCE,
+                        help='Файл заданий .jsonl или .csv вместо Google Sheets (продолжает с места остановки)')
+    parser.add_argument('--profile', action='store_true',
+                        help=f'Профилирование CPU и памяти (отчёты в {PROFILE_DIR}, в --schedule - ещё по SIGUSR1)')
 
     args = parser.parse_args()
 
+    if args.profile:
+        profiler.start(PROFILE_DIR, PROFILE_SAMPLE_INTERVAL)
+
     app = AutoPost()
+    if args.source:
+        app.source = FileTaskSource(args.source, SOURCE_BATCH)
 
-    if args.single:
-        if not args.topic:
-            print("[ОШИБКА] Укажите --topic для режима --single")
-            return
-        app.run_single(args.project, args.topic, platform=args.platform, test_mode=args.test)
-    else:
-        app.run(test_mode=args.test)
+    try:
+        if args.single:
+            if not args.topic:
+                print("[ОШИБКА] Укажите --topic для режима --single")
+                return
+            image = f"{args.image}:{args.images}" if args.images else args.image
+            app.run_single(args.project, args.topic, platform=args.platform, test_mode=args.test,
+                           image=image)
+        elif args.schedule:
+            app.run_daemon(test_mode=args.test)
+        else:
+            app.run(test_mode=args.test)
+    finally:
+        profiler.stop()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,348 @@
+"""
+Модуль HTTP API для приёма заданий.
+
+В режиме --schedule принимает задания (проект, тема, платформы, время
+публикации) в JSON по одному или пачкой и кладёт их в очередь внутри
+процесса - без ожидания следующего опроса Google Sheets. Статус задания
+можно узнать по его ID.
+
+    POST /jobs        {"project": ..., "topic": ..., "platforms": ["tg"]}
+                      или [{...}, {...}] / {"jobs": [{...}, ...]}
+    GET  /jobs/<id>   статус задания
+    GET  /jobs        последние задания (?status=queued)
+    GET  /health      состояние очереди
+"""
+
+import hmac
+import heapq
+import json
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+from services.metrics import metrics
+
+
+# Статусы заданий
+QUEUED = 'queued'            # Ждёт обработки (или времени публикации)
+PROCESSING = 'processing'    # Обрабатывается (дальше - done, error, duplicate, tested)
+
+PLATFORMS = ('tg', 'ig', 'tt')
+IMAGE_BACKENDS = ('', 'dalle', 'card')
+PRIORITIES = ('low', 'normal', 'high')
+
+# Максимальный размер тела запроса, байт
+MAX_BODY = 1024 * 1024
+
+
+class JobError(ValueError):
+    """Некорректное задание."""
+
+
+class JobQueue:
+    """Потокобезопасная очередь заданий с учётом времени публикации."""
+
+    # Сколько завершённых заданий хранить для запросов статуса
+    MAX_FINISHED = 1000
+
+    def __init__(self):
+        self._jobs = {}
+        self._finished = OrderedDict()
+        # (время публикации, порядковый номер, ID)
+        self._heap = []
+        self._seq = 0
+        self._cond = threading.Condition()
+
+    @staticmethod
+    def _parse_time(value) -> float:
+        """publish_at: ISO дата-время (локальное, если без пояса) или unix-время."""
+        if value in (None, ''):
+            return time.time()
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            timestamp = float(value)
+        else:
+            try:
+                timestamp = datetime.fromisoformat(str(value).replace('Z', '+00:00')).timestamp()
+            except ValueError:
+                raise JobError(f"publish_at: неверный формат даты '{value}'")
+
+        # NaN, бесконечность и даты вне диапазона datetime не пускаем в очередь:
+        # иначе ответ API с этим заданием не сформировать
+        try:
+            datetime.fromtimestamp(timestamp)
+        except (OverflowError, OSError, ValueError):
+            raise JobError(f"publish_at: дата вне допустимого диапазона '{value}'")
+        return timestamp
+
+    def _validate(self, data) -> dict:
+        """JSON задания -> запись очереди."""
+        if not isinstance(data, dict):
+            raise JobError("задание должно быть объектом")
+
+        project = str(data.get('project') or '').strip()
+        topic = str(data.get('topic') or '').strip()
+        if not project or not topic:
+            raise JobError("обязательные поля: project, topic")
+
+        platforms = data.get('platforms') or ['tg']
+        if isinstance(platforms, str):
+            platforms = platforms.split(',')
+        platforms = [str(p).strip().lower() for p in platforms if str(p).strip()]
+        unknown = [p for p in platforms if p not in PLATFORMS]
+        if unknown:
+            raise JobError(f"platforms: неизвестные коды {', '.join(unknown)} (допустимо {', '.join(PLATFORMS)})")
+
+        # Генератор и количество картинок: dalle, card, dalle:4, 4
+        image = str(data.get('image') or '').strip().lower()
+        backend, _, count = image.partition(':')
+        if backend.isdigit() and not count:
+            backend, count = '', backend
+        if backend not in IMAGE_BACKENDS or (count and not count.isdigit()):
+            raise JobError("image: допустимо dalle, card, dalle:4 или 4")
+
+        priority = str(data.get('priority') or 'normal').strip().lower()
+        if priority not in PRIORITIES:
+            raise JobError(f"priority: допустимо {', '.join(PRIORITIES)}")
+
+        now = datetime.now().isoformat(timespec='seconds')
+        return {
+            'id': str(data.get('id') or uuid.uuid4().hex[:12]),
+            'project': project,
+            'topic': topic,
+            'platforms': platforms,
+            'image': image,
+            'priority': priority,
+            'publish_at': self._parse_time(data.get('publish_at')),
+            'status': QUEUED,
+            'platform_status': {},
+            'post_id': None,
+            'error': '',
+            'created': now,
+            'updated': now,
+        }
+
+    def submit(self, items: list) -> list[dict]:
+        """
+        Добавить задания в очередь. Пачка добавляется целиком или не
+        добавляется совсем (если хотя бы одно задание некорректно).
+
+        Задание с уже известным ID не добавляется повторно - возвращается
+        существующее (повтор запроса безопасен).
+
+        Raises:
+            JobError: Некорректное задание (в тексте - его номер в пачке)
+        """
+        jobs = []
+        for idx, data in enumerate(items):
+            try:
+                jobs.append(self._validate(data))
+            except JobError as e:
+                raise JobError(f"задание {idx}: {e}" if len(items) > 1 else str(e))
+
+        result = []
+        with self._cond:
+            for job in jobs:
+                existing = self._jobs.get(job['id'])
+                if existing:
+                    result.append(dict(existing))
+                    continue
+                self._jobs[job['id']] = job
+                self._push(job)
+                result.append(dict(job))
+                metrics.inc('api_jobs_submitted', project=job['project'])
+            self._cond.notify_all()
+        return result
+
+    def _push(self, job: dict):
+        self._seq += 1
+        heapq.heappush(self._heap, (job['publish_at'], self._seq, job['id']))
+        metrics.gauge('api_queue_depth', len(self._heap))
+
+    def next_due(self, timeout: float = 0) -> Optional[dict]:
+        """
+        Взять задание, время публикации которого наступило.
+
+        Args:
+            timeout: Сколько ждать, если таких заданий нет, секунды
+
+        Returns:
+            Копия задания (статус уже processing) или None
+        """
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                now = time.time()
+                if self._heap and self._heap[0][0] <= now:
+                    job_id = heapq.heappop(self._heap)[2]
+                    metrics.gauge('api_queue_depth', len(self._heap))
+                    job = self._jobs[job_id]
+                    self._set(job, status=PROCESSING)
+                    metrics.observe('api_job_wait', max(0.0, now - job['publish_at']), job['project'])
+                    return dict(job)
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                if self._heap:
+                    remaining = min(remaining, self._heap[0][0] - now)
+                self._cond.wait(remaining)
+
+    def _set(self, job: dict, **fields):
+        job.update(fields)
+        job['updated'] = datetime.now().isoformat(timespec='seconds')
+
+    def update(self, job_id: str, **fields):
+        """Обновить поля задания (например, platform_status)."""
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job:
+                self._set(job, **fields)
+
+    def finish(self, job_id: str, status: str, post_id: str = None, error: str = ''):
+        """Записать итоговый статус задания."""
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if not job:
+                return
+            self._set(job, status=status, post_id=post_id, error=error)
+            self._finished[job_id] = True
+            # Старые завершённые задания забываем
+            while len(self._finished) > self.MAX_FINISHED:
+                old_id, _ = self._finished.popitem(last=False)
+                self._jobs.pop(old_id, None)
+
+    def retry(self, job_id: str, delay: float, error: str = ''):
+        """Вернуть задание в очередь через delay секунд."""
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if not job:
+                return
+            self._set(job, status=QUEUED, publish_at=time.time() + delay, error=error)
+            self._push(job)
+            self._cond.notify_all()
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._cond:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def recent(self, status: str = '', limit: int = 100) -> list[dict]:
+        """Последние задания (новые в конце), не больше limit."""
+        if limit <= 0:
+            return []
+        with self._cond:
+            jobs = [dict(j) for j in self._jobs.values() if not status or j['status'] == status]
+        return jobs[-limit:]
+
+    def depth(self) -> int:
+        """Сколько заданий ждёт в очереди."""
+        with self._cond:
+            return len(self._heap)
+
+    def serve(self, port: int, host: str = '127.0.0.1', token: str = '') -> ThreadingHTTPServer:
+        """
+        Запустить HTTP API в фоновом потоке.
+
+        Args:
+            token: Если задан, запросы должны передавать его в заголовке
+                Authorization: Bearer <token>
+        """
+        queue = self
+
+        class ApiHandler(BaseHTTPRequestHandler):
+            def _send(self, code: int, payload):
+                body = json.dumps(payload, ensure_ascii=False, default=_json_default).encode('utf-8')
+                self.send_response(code)
+                self.send_header('Content-Type', 'application/json; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _authorized(self) -> bool:
+                if not token:
+                    return True
+                header = self.headers.get('Authorization', '')
+                if hmac.compare_digest(header.encode('utf-8'), f"Bearer {token}".encode('utf-8')):
+                    return True
+                self._send(401, {'error': 'unauthorized'})
+                return False
+
+            def do_GET(self):
+                if not self._authorized():
+                    return
+                path, _, query = self.path.partition('?')
+                params = dict(p.split('=', 1) for p in query.split('&') if '=' in p)
+
+                if path == '/health':
+                    self._send(200, {'status': 'ok', 'queued': queue.depth()})
+                elif path == '/jobs':
+                    limit = int(params['limit']) if params.get('limit', '').isdigit() else 100
+                    self._send(200, {'jobs': [_public(j) for j in queue.recent(params.get('status', ''), limit)]})
+                elif path.startswith('/jobs/'):
+                    job = queue.get(path[len('/jobs/'):])
+                    if job:
+                        self._send(200, _public(job))
+                    else:
+                        self._send(404, {'error': 'job not found'})
+                else:
+                    self._send(404, {'error': 'not found'})
+
+            def do_POST(self):
+                if not self._authorized():
+                    return
+                if self.path.split('?')[0] != '/jobs':
+                    self._send(404, {'error': 'not found'})
+                    return
+
+                try:
+                    length = int(self.headers.get('Content-Length') or 0)
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    self._send(400, {'error': 'invalid Content-Length'})
+                    return
+                if length > MAX_BODY:
+                    self._send(413, {'error': 'request too large'})
+                    return
+                try:
+                    data = json.loads(self.rfile.read(length) or b'null')
+                except ValueError:
+                    self._send(400, {'error': 'invalid JSON'})
+                    return
+
+                bulk = isinstance(data, list) or (isinstance(data, dict) and 'jobs' in data)
+                items = data if isinstance(data, list) else data.get('jobs') if bulk else [data]
+                if not isinstance(items, list) or not items:
+                    self._send(400, {'error': 'expected a job object or a non-empty list of jobs'})
+                    return
+
+                try:
+                    jobs = queue.submit(items)
+                except JobError as e:
+                    self._send(400, {'error': str(e)})
+                    return
+
+                jobs = [_public(j) for j in jobs]
+                self._send(202, {'jobs': jobs} if bulk else jobs[0])
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), ApiHandler)
+        thread = threading.Thread(target=server.serve_forever, name='api-http', daemon=True)
+        thread.start()
+        print(f"[OK] API заданий доступен на http://{host}:{server.server_address[1]}/jobs")
+        return server
+
+
+def _public(job: dict) -> dict:
+    """Задание для ответа API (время публикации - в ISO формате)."""
+    return {**job, 'publish_at': datetime.fromtimestamp(job['publish_at']).isoformat(timespec='seconds')}
+
+
+def _json_default(value):
+    return str(value)
@@ -0,0 +1,59 @@
+"""
+Кэш сгенерированного контента.
+
+Сохраняет тексты и картинку задания до тех пор, пока оно не будет
+опубликовано на всех платформах. При повторной обработке строки после
+частичной ошибки контент берётся отсюда, без новых запросов к OpenAI.
+"""
+
+import hashlib
+import json
+import os
+from typing import Optional
+
+
+class ContentCache:
+    """Файловый кэш контента: один JSON на тему проекта."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def _path(self, project: str, topic: str) -> str:
+        key = hashlib.sha1(f"{project}\n{topic}".encode('utf-8')).hexdigest()[:16]
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, project: str, topic: str) -> Optional[dict]:
+        """
+        Returns:
+            {'texts': {platform: text}, 'image_path': str, 'image_paths': list} или None
+        """
+        path = self._path(project, topic)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def put(self, project: str, topic: str, contents: dict):
+        """Сохранить контент {platform: {'text', 'image_path', 'image_paths'}} (дополняет уже сохранённый)."""
+        cached = self.get(project, topic) or {'texts': {}, 'image_path': ''}
+        for platform, content in contents.items():
+            if content.get('text'):
+                cached['texts'][platform] = content['text']
+            if content.get('image_path'):
+                cached['image_path'] = content['image_path']
+                cached['image_paths'] = content.get('image_paths') or [content['image_path']]
+
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(project, topic)
+        with open(f"{path}.tmp", 'w', encoding='utf-8') as f:
+            json.dump(cached, f, ensure_ascii=False)
+        os.replace(f"{path}.tmp", path)
+
+    def drop(self, project: str, topic: str):
+        """Удалить контент (задание выполнено полностью)."""
+        path = self._path(project, topic)
+        if os.path.exists(path):
+            os.remove(path)
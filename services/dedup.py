@@ -0,0 +1,297 @@
+"""
+Модуль поиска похожих тем.
+
+Хранит историю опубликованных тем (и сгенерированный для них контент)
+по проектам и находит перефразированные повторы через MinHash по
+нормализованному русскому тексту. Индекс лежит в локальном JSONL файле
+и дописывается по мере выполнения заданий.
+"""
+
+import json
+import os
+import random
+import re
+import threading
+import zlib
+from datetime import datetime
+from typing import Optional
+
+
+# Служебные слова, которые не несут смысла темы
+STOPWORDS = {
+    'в', 'во', 'на', 'и', 'или', 'для', 'с', 'со', 'по', 'о', 'об', 'обо', 'из', 'к', 'ко',
+    'у', 'от', 'до', 'за', 'под', 'над', 'при', 'про', 'без', 'как', 'что', 'это', 'все',
+    'всё', 'вы', 'мы', 'ваш', 'наш', 'не', 'ли', 'же', 'а', 'но', 'то', 'так', 'чем',
+    'где', 'куда', 'когда', 'зачем', 'почему', 'какой', 'какая', 'какие', 'через',
+    'the', 'a', 'an', 'of', 'in', 'on', 'for', 'to', 'and', 'or', 'how', 'what',
+}
+
+# Слова-"обёртки" заголовков (основы): топ-5, лучшие, самые...
+FILLER_STEMS = {'топ', 'лучш', 'сам', 'нов', 'главн'}
+
+# Близкие по смыслу основы, которые в темах проектов взаимозаменяемы:
+# "места" / "пляжи" / "курорты", "отдых" / "отдохнуть" / "отпуск"
+STEM_SYNONYMS = {
+    'пляж': 'мест',
+    'курорт': 'мест',
+    'локац': 'мест',
+    'отдохнут': 'отд',
+    'отпуск': 'отд',
+    'заработок': 'заработк',
+    'заработ': 'заработк',
+    'зарабатыва': 'заработк',
+}
+
+# Стеммер Портера для русского языка (правила Snowball). Окончания первой
+# группы в парах должны стоять после "а" или "я".
+_VOWELS = 'аеиоуыэюя'
+_PERFECTIVE_GERUND = (('в', 'вши', 'вшись'), ('ив', 'ивши', 'ившись', 'ыв', 'ывши', 'ывшись'))
+_REFLEXIVE = ((), ('ся', 'сь'))
+_ADJECTIVE = (
+    'ее', 'ие', 'ые', 'ое', 'ими', 'ыми', 'ей', 'ий', 'ый', 'ой', 'ем', 'им', 'ым', 'ом',
+    'его', 'ого', 'ему', 'ому', 'их', 'ых', 'ую', 'юю', 'ая', 'яя', 'ою', 'ею',
+)
+_PARTICIPLE = (('ем', 'нн', 'вш', 'ющ', 'щ'), ('ивш', 'ывш', 'ующ'))
+_VERB = (
+    ('ла', 'на', 'ете', 'йте', 'ли', 'й', 'л', 'ем', 'н', 'ло', 'но', 'ет', 'ют', 'ны', 'ть', 'ешь', 'нно'),
+    ('ила', 'ыла', 'ена', 'ейте', 'уйте', 'ите', 'или', 'ыли', 'ей', 'уй', 'ил', 'ыл', 'им', 'ым',
+     'ен', 'ило', 'ыло', 'ено', 'ят', 'ует', 'уют', 'ит', 'ыт', 'ены', 'ить', 'ыть', 'ишь', 'ую', 'ю'),
+)
+_NOUN = ((), (
+    'а', 'ев', 'ов', 'ие', 'ье', 'е', 'иями', 'ями', 'ами', 'еи', 'ии', 'и', 'ией', 'ей', 'ой',
+    'ий', 'й', 'иям', 'ям', 'ием', 'ем', 'ам', 'ом', 'о', 'у', 'ах', 'иях', 'ях', 'ы', 'ь',
+    'ию', 'ью', 'ю', 'ия', 'ья', 'я',
+))
+_DERIVATIONAL = ('ост', 'ость')
+_SUPERLATIVE = ('ейше', 'ейш')
+
+_WORD_RE = re.compile(r'[a-zа-я0-9]+')
+_CYRILLIC_RE = re.compile(r'[а-я]')
+
+# Простое число для хешей MinHash (2^61 - 1)
+_PRIME = (1 << 61) - 1
+
+
+def normalize(text: str) -> list[str]:
+    """Текст -> список основ слов без служебных слов."""
+    text = text.lower().replace('ё', 'е')
+    stems = []
+    for word in _WORD_RE.findall(text):
+        if word in STOPWORDS or word.isdigit():
+            continue
+        stem = _stem(word)
+        if len(stem) < 2 or stem in FILLER_STEMS:
+            continue
+        stems.append(STEM_SYNONYMS.get(stem, stem))
+    return stems
+
+
+def _strip(rv: str, groups: tuple) -> Optional[str]:
+    """Срезать самое длинное окончание из групп (первая - только после "а"/"я")."""
+    endings = [(e, 0) for e in groups[0]] + [(e, 1) for e in groups[1]]
+    for ending, group in sorted(endings, key=lambda item: len(item[0]), reverse=True):
+        if not rv.endswith(ending):
+            continue
+        rest = rv[:-len(ending)]
+        if group == 0 and not rest.endswith(('а', 'я')):
+            continue
+        return rest
+    return None
+
+
+def _region(word: str) -> int:
+    """Начало области после первой гласной, за которой идёт согласная (R1)."""
+    for i in range(1, len(word)):
+        if word[i - 1] in _VOWELS and word[i] not in _VOWELS:
+            return i + 1
+    return len(word)
+
+
+def _stem(word: str) -> str:
+    """Основа слова, одна во всех падежах: "отдых", "отдыха", "отдыхе" -> "отд".
+
+    Snowball срезает с "отдых" окончание прилагательного, а с "отдыха" - только
+    падежное, поэтому проход повторяется, пока основа не перестанет меняться.
+    """
+    while True:
+        stem = _stem_once(word)
+        if stem == word:
+            return stem
+        word = stem
+
+
+def _stem_once(word: str) -> str:
+    """Один проход Snowball (латиница и короткие слова - как есть)."""
+    if len(word) <= 3 or not _CYRILLIC_RE.search(word):
+        return word
+
+    # Окончания ищутся только после первой гласной (RV)
+    start = next((i + 1 for i, ch in enumerate(word) if ch in _VOWELS), len(word))
+    head, rv = word[:start], word[start:]
+
+    # Шаг 1: деепричастие, иначе возвратная частица и прилагательное / глагол / существительное
+    stripped = _strip(rv, _PERFECTIVE_GERUND)
+    if stripped is None:
+        # "-сь" - частица только перед глагольным окончанием: "запись" - не глагол
+        base = _strip(rv, _REFLEXIVE) or rv
+        stripped = _strip(base, ((), _ADJECTIVE))
+        if stripped is not None:
+            # Причастие перед окончанием прилагательного: "читающие" -> "чита"
+            participle = _strip(stripped, _PARTICIPLE)
+            stripped = stripped if participle is None else participle
+        else:
+            stripped = _strip(base, _VERB)
+            if stripped is None:
+                stripped = _strip(rv, _NOUN)
+    if stripped is not None:
+        rv = stripped
+
+    # Шаг 2: "и" на конце
+    if rv.endswith('и'):
+        rv = rv[:-1]
+
+    # Шаг 3: словообразовательный суффикс в R2
+    word = head + rv
+    r1 = _region(word)
+    r2 = r1 + _region(word[r1:])
+    for suffix in _DERIVATIONAL:
+        if word.endswith(suffix) and len(word) - len(suffix) >= r2:
+            word = word[:-len(suffix)]
+            break
+
+    # Шаг 4: превосходная степень, двойное "н", мягкий знак
+    for suffix in _SUPERLATIVE:
+        if word.endswith(suffix) and len(word) - len(suffix) >= start:
+            word = word[:-len(suffix)]
+            break
+    if word.endswith('нн'):
+        word = word[:-1]
+    elif word.endswith('ь'):
+        word = word[:-1]
+    return word
+
+
+def shingles(text: str) -> set[str]:
+    """Шинглы текста: основы значимых слов (темы короткие, порядок слов не важен)."""
+    return set(normalize(text))
+
+
+class TopicIndex:
+    """Индекс тем с MinHash и LSH-корзинами для быстрого поиска."""
+
+    NUM_PERM = 128
+    BANDS = 32  # 32 полосы по 4 хеша: кандидат при сходстве примерно от 0.4
+
+    def __init__(self, path: str, threshold: float = 0.6):
+        """
+        Args:
+            path: JSONL файл индекса
+            threshold: Минимальное сходство (оценка Жаккара), чтобы считать тему повтором
+        """
+        self.path = path
+        self.threshold = threshold
+        self.entries = []
+        # (проект, номер полосы, хеш полосы) -> индексы записей
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+        rng = random.Random(42)
+        self._perms = [
+            (rng.randrange(1, _PRIME), rng.randrange(0, _PRIME))
+            for _ in range(self.NUM_PERM)
+        ]
+        self._rows = self.NUM_PERM // self.BANDS
+
+    def load(self) -> int:
+        """Загрузить индекс из файла. Возвращает количество записей."""
+        if not os.path.exists(self.path):
+            return 0
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entry = json.loads(line)
+                    # Подпись пересчитывается: записи старых версий строились другим стеммером
+                    entry['signature'] = self.signature(entry['topic'])
+                    self._insert(entry)
+                except (ValueError, KeyError, TypeError):
+                    continue
+        return len(self.entries)
+
+    def signature(self, text: str) -> tuple:
+        """MinHash подпись текста (пустой кортеж, если в тексте нет значимых слов)."""
+        hashes = [zlib.crc32(s.encode('utf-8')) for s in shingles(text)]
+        if not hashes:
+            return ()
+        return tuple(min((a * h + b) % _PRIME for h in hashes) for a, b in self._perms)
+
+    def _bands(self, signature: tuple):
+        for band in range(self.BANDS):
+            yield band, hash(signature[band * self._rows:(band + 1) * self._rows])
+
+    def _insert(self, entry: dict):
+        entry['signature'] = tuple(entry['signature'])
+        idx = len(self.entries)
+        self.entries.append(entry)
+        if not entry['signature']:
+            return
+        for band, band_hash in self._bands(entry['signature']):
+            self._buckets.setdefault((entry['project'], band, band_hash), []).append(idx)
+
+    @staticmethod
+    def similarity(left: tuple, right: tuple) -> float:
+        """Оценка сходства по Жаккару по двум подписям."""
+        if not left or not right:
+            return 0.0
+        return sum(1 for a, b in zip(left, right) if a == b) / len(left)
+
+    def find(self, project: str, topic: str) -> Optional[tuple[dict, float]]:
+        """
+        Найти самую похожую прошлую тему проекта.
+
+        Returns:
+            (запись, сходство) или None
+        """
+        signature = self.signature(topic)
+        if not signature:
+            return None
+
+        with self._lock:
+            candidates = set()
+            for band, band_hash in self._bands(signature):
+                candidates.update(self._buckets.get((project, band, band_hash), ()))
+
+            best = None
+            for idx in candidates:
+                entry = self.entries[idx]
+                score = self.similarity(signature, entry['signature'])
+                if score >= self.threshold and (best is None or score > best[1]):
+                    best = (entry, score)
+        return best
+
+    def add(self, project: str, topic: str, contents: dict = None) -> dict:
+        """
+        Добавить тему в индекс и дописать её в файл.
+
+        Args:
+            contents: {platform: {'text': str, 'image_path': str, 'image_paths': list}} - для повторного использования
+        """
+        contents = contents or {}
+        entry = {
+            'project': project,
+            'topic': topic,
+            'signature': list(self.signature(topic)),
+            'texts': {p: c.get('text', '') for p, c in contents.items() if c.get('text')},
+            'image_path': next((c.get('image_path') for c in contents.values() if c.get('image_path')), ''),
+            'image_paths': next((c.get('image_paths') for c in contents.values() if c.get('image_paths')), []),
+            'created': datetime.now().isoformat(timespec='seconds'),
+        }
+
+        with self._lock:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+            self._insert(entry)
+        return entry
@@ -0,0 +1,156 @@
+"""
+Модуль справедливой очереди заданий.
+
+Взвешенная справедливая очередь (start-time fair queuing) по проектам:
+каждое задание получает виртуальное время окончания start + 1 / вес
+проекта, и первым выдаётся задание с наименьшим временем. Так пачка из
+200 строк одного проекта не задерживает посты других проектов: проекты
+обслуживаются по очереди пропорционально весам. Приоритет строки
+(high / low) важнее справедливости, а число одновременно выполняемых
+заданий проекта можно ограничить.
+"""
+
+import heapq
+import threading
+import time
+from collections import defaultdict
+from typing import Callable, Optional
+
+from services.metrics import metrics
+
+
+# Приоритет строки -> класс очереди (меньше - раньше)
+PRIORITY_RANKS = {'high': 0, 'normal': 1, 'low': 2}
+
+
+class FairQueue:
+    """Потокобезопасная взвешенная очередь заданий по проектам."""
+
+    def __init__(self, weights: dict = None, concurrency: dict = None, default_weight: float = 1.0):
+        """
+        Args:
+            weights: Веса проектов {проект: вес} (по умолчанию default_weight)
+            concurrency: Максимум одновременно выполняемых заданий {проект: N} (0 - без ограничения)
+            default_weight: Вес проектов, которых нет в weights
+        """
+        self.weights = weights or {}
+        self.concurrency = concurrency or {}
+        self.default_weight = default_weight
+        # (класс приоритета, время окончания, номер, время начала, задание)
+        self._heap = []
+        self._seq = 0
+        # Виртуальное время очереди и время окончания последнего задания проекта
+        self._virtual = 0.0
+        self._finish = defaultdict(float)
+        self._in_flight = defaultdict(int)
+        self._depth = defaultdict(int)
+        self._cond = threading.Condition()
+
+    def weight(self, project: str) -> float:
+        return max(float(self.weights.get(project, self.default_weight)), 0.001)
+
+    def _tag(self, task: dict, finish: dict) -> tuple[int, float, float]:
+        """Класс приоритета и виртуальные времена начала и окончания задания."""
+        project = task['project']
+        start = max(self._virtual, finish[project])
+        finish[project] = start + 1.0 / self.weight(project)
+        rank = PRIORITY_RANKS.get(task.get('priority', 'normal'), 1)
+        return rank, finish[project], start
+
+    def push(self, task: dict):
+        """Добавить задание в очередь."""
+        with self._cond:
+            rank, finish, start = self._tag(task, self._finish)
+            self._seq += 1
+            heapq.heappush(self._heap, (rank, finish, self._seq, start, task))
+            task['queued_at'] = time.monotonic()
+            self._set_depth(task['project'], 1)
+            self._cond.notify_all()
+
+    def pick(self, tasks: list, limit: int) -> list:
+        """
+        Выбрать limit заданий в том порядке, в каком их выдала бы очередь
+        (с учётом уже стоящих в ней). Для захвата строк из таблицы.
+        """
+        with self._cond:
+            finish = defaultdict(float, self._finish)
+            tagged = [(*self._tag(task, finish)[:2], idx) for idx, task in enumerate(tasks)]
+        return [tasks[idx] for _, _, idx in sorted(tagged)[:limit]]
+
+    def _eligible(self, task: dict) -> bool:
+        cap = self.concurrency.get(task['project'], 0)
+        return not cap or self._in_flight[task['project']] < cap
+
+    def pop(self, defer: Callable[[dict], bool] = None) -> Optional[dict]:
+        """
+        Взять следующее задание. Если все задания в очереди упёрлись в
+        ограничение одновременности своих проектов - ждёт.
+
+        Args:
+            defer: Задания, для которых вернёт True, выдаются только если
+                других подходящих нет (например, платформа ещё не подключена)
+
+        Returns:
+            Задание или None, если очередь пуста
+        """
+        with self._cond:
+            while True:
+                if not self._heap:
+                    return None
+                entry = self._take(defer)
+                if entry:
+                    break
+                self._cond.wait()
+
+            rank, finish, _, start, task = entry
+            project = task['project']
+            self._virtual = max(self._virtual, start)
+            self._in_flight[project] += 1
+            self._set_depth(project, -1)
+
+        metrics.observe('queue_wait', time.monotonic() - task['queued_at'], project)
+        return task
+
+    def _take(self, defer: Callable[[dict], bool] = None) -> Optional[tuple]:
+        """Достать из кучи первое подходящее задание (остальные вернуть)."""
+        skipped = []
+        deferred = None
+        found = None
+        while self._heap:
+            entry = heapq.heappop(self._heap)
+            task = entry[4]
+            if not self._eligible(task):
+                skipped.append(entry)
+            elif defer and defer(task):
+                if deferred is None:
+                    deferred = entry
+                else:
+                    skipped.append(entry)
+            else:
+                found = entry
+                break
+
+        if found is None:
+            found, deferred = deferred, None
+        for entry in skipped + ([deferred] if deferred else []):
+            heapq.heappush(self._heap, entry)
+        return found
+
+    def done(self, task: dict):
+        """Задание выполнено (освобождает место в ограничении проекта)."""
+        with self._cond:
+            self._in_flight[task['project']] -= 1
+            self._cond.notify_all()
+
+    def _set_depth(self, project: str, delta: int):
+        self._depth[project] += delta
+        metrics.gauge('queue_depth', self._depth[project], project=project)
+
+    def depth(self) -> dict:
+        """Заданий в очереди по проектам."""
+        with self._cond:
+            return {project: n for project, n in self._depth.items() if n}
+
+    def __len__(self) -> int:
+        with self._cond:
+            return len(self._heap)
@@ -3,14 +3,30 @@
 Генерирует текст (GPT) и изображения (DALL-E).
 """
 
+import json
 import openai
 import requests
 import os
 import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from types import SimpleNamespace
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from config.settings import OPENAI_API_KEY
+from config.settings import (
+    OPENAI_API_KEY, TEXT_GENERATION_MODE, IMAGE_BACKEND, PROJECT_IMAGE_BACKENDS,
+    IMAGE_FALLBACK, DALLE_TIMEOUT, DALLE_MAX_FAILURES, DALLE_COOLDOWN_SECONDS, CARD_FONT,
+    ALBUM_SIZE, PROJECT_ALBUM_SIZES, DALLE_CONCURRENCY,
+    OPENAI_TEXT_MODEL, OPENAI_CHEAP_TEXT_MODEL, USAGE_DB_FILE, OPENAI_TEXT_DEADLINE,
+    HEDGE_MAX_RATIO, HEDGE_QUANTILE, HEDGE_MIN_SAMPLES, HEDGE_IMAGES,
+    DAILY_BUDGET_USD, MONTHLY_BUDGET_USD, BUDGET_SOFT_RATIO,
+)
+from services.hedging import Hedger
+from services.images import CardRenderer
+from services.metering import UsageMeter, BUDGET_NORMAL
+from services.metrics import metrics
 
 
 class ContentGenerator:
@@ -30,12 +46,61 @@ class ContentGenerator:
         },
     }
 
+    # Стили изображений для проектов (DALL-E)
+    IMAGE_STYLES = {
+        'RouteOfRest': 'красивое фото природы, путешествия, яркие цвета, профессиональная фотография',
+        'NBot': 'современный минималистичный дизайн, технологии, финансы, синие и зелёные тона',
+    }
+
+    # Варианты кадра для картинок альбома (первая картинка - без уточнения)
+    IMAGE_VARIATIONS = [
+        'общий план',
+        'крупный план детали',
+        'люди в кадре',
+        'вид сверху',
+        'вечернее освещение',
+        'утренний свет',
+        'необычный ракурс',
+        'атмосферный фон с глубиной резкости',
+        'яркие акцентные цвета',
+    ]
+
+    # Максимум картинок в альбоме (ограничение Telegram и Instagram)
+    ALBUM_MAX = 10
+
+    # Оформление карточек для локального рендерера (IMAGE_BACKEND=card)
+    CARD_STYLES = {
+        'RouteOfRest': {
+            'gradient': ('#ff9a56', '#ff5e62'),
+            'text_color': '#ffffff',
+            'accent': '#fff3b0',
+            'label': 'RouteOfRest',
+            'logo': None,
+        },
+        'NBot': {
+            'gradient': ('#0f2027', '#2c5364'),
+            'text_color': '#e0f7fa',
+            'accent': '#00e676',
+            'label': 'NBot',
+            'logo': None,
+        },
+    }
+
     def __init__(self):
         self.client = None
+        self.async_client = None
         self.temp_dir = os.path.join(
             os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
             'temp'
         )
+        self.card_renderer = CardRenderer(self.temp_dir, font_path=CARD_FONT)
+        # Ошибки DALL-E подряд и время, до которого он отключён
+        self._dalle_failures = 0
+        self._dalle_paused_until = 0.0
+        # Ограничение одновременных запросов к DALL-E (общее для всех заданий)
+        self._dalle_slots = threading.BoundedSemaphore(max(1, DALLE_CONCURRENCY))
+        self.meter = UsageMeter(USAGE_DB_FILE, DAILY_BUDGET_USD, MONTHLY_BUDGET_USD, BUDGET_SOFT_RATIO)
+        self.hedger = Hedger(HEDGE_MAX_RATIO, HEDGE_QUANTILE, HEDGE_MIN_SAMPLES)
 
     def connect(self) -> bool:
         """Инициализация клиента OpenAI."""
@@ -45,12 +110,126 @@ class ContentGenerator:
                 return False
 
             self.client = openai.OpenAI(api_key=OPENAI_API_KEY)
+            # Генерация - через async клиент: дедлайн, дубли и отмена запросов
+            self.async_client = openai.AsyncOpenAI(api_key=OPENAI_API_KEY)
             print("[OK] OpenAI клиент инициализирован")
             return True
         except Exception as e:
             print(f"[ОШИБКА] Не удалось подключиться к OpenAI: {e}")
             return False
 
+    def health_check(self) -> bool:
+        """Проверка ключа: запрос описания модели (бесплатный)."""
+        try:
+            self.client.with_options(timeout=15).models.retrieve(OPENAI_TEXT_MODEL)
+            return True
+        except Exception as e:
+            print(f"[ОШИБКА] OpenAI не отвечает: {e}")
+            return False
+
+    # Длина текста по платформам: (минимум, максимум, формулировка для промпта)
+    LENGTH_LIMITS = {
+        'tg': (1500, 2000, '1500-2000 символов'),
+        'ig': (1800, 2200, '1800-2200 символов'),
+        'tt': (150, 300, '150-300 символов (короткое описание для видео)'),
+    }
+    DEFAULT_LENGTH = (1000, 2000, '1500 символов')
+
+    # Жёсткие ограничения платформ на длину подписи
+    HARD_LENGTH_LIMITS = {
+        'ig': 2200,
+        'tt': 2200,
+    }
+
+    # Допустимое отклонение длины от диапазона в промпте
+    LENGTH_TOLERANCE = 0.25
+
+    SYSTEM_PROMPT = "Ты - опытный SMM-специалист. Пишешь вовлекающие посты для социальных сетей."
+
+    def text_model(self) -> str:
+        """Модель для текста: при приближении к бюджету - более дешёвая."""
+        if self.meter.budget_state() != BUDGET_NORMAL:
+            return OPENAI_CHEAP_TEXT_MODEL
+        return OPENAI_TEXT_MODEL
+
+    def _chat(self, project: str, platform: str, kind: str, **request):
+        """
+        Запрос chat.completions с дедлайном и хеджированием. Если модель не
+        ответила за OPENAI_TEXT_DEADLINE, запрос повторяется на дешёвой модели.
+
+        Returns:
+            (ответ, модель)
+        """
+        model = self.text_model()
+        # Бюджет на исходе - без дублирующих запросов
+        hedge = self.meter.budget_state() == BUDGET_NORMAL
+
+        # Отменённые запросы (проигравший дубль, дедлайн): [(модель, количество)]
+        abandoned = []
+
+        def send(model):
+            return lambda: self.async_client.chat.completions.create(model=model, **request)
+
+        def call(model, hedge):
+            return self.hedger.call(send(model), kind, OPENAI_TEXT_DEADLINE, hedge,
+                                    on_abandoned=lambda count: abandoned.append((model, count)))
+
+        response = None
+        try:
+            try:
+                response = call(model, hedge)
+            except TimeoutError:
+                if model == OPENAI_CHEAP_TEXT_MODEL:
+                    raise
+                print(f"[!] {model} не ответила за {OPENAI_TEXT_DEADLINE} сек., повтор на {OPENAI_CHEAP_TEXT_MODEL}")
+                metrics.inc('openai_escalations', kind=kind)
+                model = OPENAI_CHEAP_TEXT_MODEL
+                response = call(model, hedge=False)
+        finally:
+            # За отменённые запросы OpenAI тоже списывает деньги: оцениваем их
+            # по ответу, а если ответа нет - по длине промпта
+            usage = response.usage if response is not None else self._estimate_usage(request)
+            for abandoned_model, count in abandoned:
+                for _ in range(count):
+                    self.meter.record_tokens(project, platform, abandoned_model, usage)
+
+        self.meter.record_tokens(project, platform, model, response.usage)
+        return response, model
+
+    @staticmethod
+    def _estimate_usage(request: dict) -> SimpleNamespace:
+        """Оценка токенов запроса без ответа (~3 символа на токен, ответ не считаем)."""
+        chars = sum(len(str(m.get('content', ''))) for m in request.get('messages', []))
+        return SimpleNamespace(prompt_tokens=chars // 3, completion_tokens=0)
+
+    def _project_config(self, project: str) -> dict:
+        """Настройки проекта для промпта."""
+        return self.PROJECT_PROMPTS.get(project, {
+            'style': 'информационный блог',
+            'tone': 'нейтральный',
+            'hashtags': '',
+        })
+
+    def _requirements(self, project_config: dict) -> str:
+        """Общие требования к посту."""
+        return f"""Требования:
+- Пост должен быть на русском языке
+- Начни с цепляющего заголовка или вопроса
+- Добавь полезную информацию по теме
+- Используй абзацы для читаемости
+- В конце добавь призыв к действию
+- Добавь релевантные хэштеги: {project_config['hashtags']}"""
+
+    def is_valid_length(self, platform: str, text: str) -> bool:
+        """Проверка, что длина текста укладывается в лимит платформы (с допуском)."""
+        if not text:
+            return False
+        minimum, maximum, _ = self.LENGTH_LIMITS.get(platform, self.DEFAULT_LENGTH)
+        hard_limit = self.HARD_LENGTH_LIMITS.get(platform)
+        if hard_limit and len(text) > hard_limit:
+            return False
+        return minimum * (1 - self.LENGTH_TOLERANCE) <= len(text) <= maximum * (1 + self.LENGTH_TOLERANCE)
+
     def generate_text(self, project: str, topic: str, platform: str = 'tg') -> str:
         """
         Генерация текста поста.
@@ -68,62 +247,257 @@ class ContentGenerator:
             return ""
 
         # Получаем настройки проекта
-        project_config = self.PROJECT_PROMPTS.get(project, {
-            'style': 'информационный блог',
-            'tone': 'нейтральный',
-            'hashtags': '',
-        })
-
-        # Ограничения по платформам
-        length_limits = {
-            'tg': '1500-2000 символов',
-            'ig': '1800-2200 символов',
-            'tt': '150-300 символов (короткое описание для видео)',
-        }
+        project_config = self._project_config(project)
+        length = self.LENGTH_LIMITS.get(platform, self.DEFAULT_LENGTH)[2]
 
         prompt = f"""Напиши пост для социальной сети на тему: "{topic}"
 
 Проект: {project}
 Стиль: {project_config['style']}
 Тон: {project_config['tone']}
-Длина: {length_limits.get(platform, '1500 символов')}
+Длина: {length}
 
-Требования:
-- Пост должен быть на русском языке
-- Начни с цепляющего заголовка или вопроса
-- Добавь полезную информацию по теме
-- Используй абзацы для читаемости
-- В конце добавь призыв к действию
-- Добавь релевантные хэштеги: {project_config['hashtags']}
+{self._requirements(project_config)}
 
 Напиши только текст поста, без пояснений."""
 
-        try:
-            response = self.client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {"role": "system", "content": "Ты - опытный SMM-специалист. Пишешь вовлекающие посты для социальных сетей."},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=1000,
-                temperature=0.7,
-            )
-
-            text = response.choices[0].message.content.strip()
-            print(f"[OK] Текст сгенерирован ({len(text)} символов)")
-            return text
+        with metrics.span('generate_text', project, platform) as span:
+            try:
+                response, _ = self._chat(
+                    project, platform, 'text',
+                    messages=[
+                        {"role": "system", "content": self.SYSTEM_PROMPT},
+                        {"role": "user", "content": prompt}
+                    ],
+                    max_tokens=1000,
+                    temperature=0.7,
+                )
+
+                text = response.choices[0].message.content.strip()
+                print(f"[OK] Текст сгенерирован ({len(text)} символов)")
+                return text
+
+            except Exception as e:
+                span.fail()
+                print(f"[ОШИБКА] Не удалось сгенерировать текст: {e}")
+                return ""
+
+    def _generate_texts_batch(self, project: str, topic: str, platforms: list[str]) -> dict:
+        """
+        Один запрос к GPT на тексты сразу для нескольких платформ.
 
-        except Exception as e:
-            print(f"[ОШИБКА] Не удалось сгенерировать текст: {e}")
-            return ""
+        Ответ запрашивается в виде JSON по схеме {платформа: текст}.
 
-    def generate_image(self, project: str, topic: str) -> str:
+        Returns:
+            {platform: text} (пустой словарь при ошибке)
+        """
+        project_config = self._project_config(project)
+        variants = "\n".join(
+            f'- "{platform}": {self.LENGTH_LIMITS.get(platform, self.DEFAULT_LENGTH)[2]}'
+            for platform in platforms
+        )
+
+        prompt = f"""Напиши посты для социальных сетей на тему: "{topic}"
+
+Проект: {project}
+Стиль: {project_config['style']}
+Тон: {project_config['tone']}
+
+Нужны отдельные варианты поста для платформ (ключ - длина):
+{variants}
+
+{self._requirements(project_config)}
+
+Каждый вариант - самостоятельный готовый пост, строго в своём диапазоне длины.
+Верни JSON-объект, где ключ - код платформы, значение - текст поста."""
+
+        schema = {
+            'type': 'object',
+            'properties': {platform: {'type': 'string'} for platform in platforms},
+            'required': list(platforms),
+            'additionalProperties': False,
+        }
+
+        with metrics.span('generate_text', project, '+'.join(platforms)) as span:
+            try:
+                response, _ = self._chat(
+                    project, '+'.join(platforms), 'text_batch',
+                    messages=[
+                        {"role": "system", "content": self.SYSTEM_PROMPT},
+                        {"role": "user", "content": prompt}
+                    ],
+                    response_format={
+                        'type': 'json_schema',
+                        'json_schema': {'name': 'posts', 'strict': True, 'schema': schema},
+                    },
+                    max_tokens=1000 * len(platforms),
+                    temperature=0.7,
+                )
+
+                data = json.loads(response.choices[0].message.content)
+                texts = {
+                    platform: str(data.get(platform) or '').strip()
+                    for platform in platforms
+                }
+                lengths = ', '.join(f"{p}: {len(t)}" for p, t in texts.items())
+                print(f"[OK] Тексты сгенерированы одним запросом ({lengths} символов)")
+                return texts
+
+            except Exception as e:
+                span.fail()
+                print(f"[ОШИБКА] Не удалось сгенерировать тексты одним запросом: {e}")
+                return {}
+
+    def generate_texts(self, project: str, topic: str, platforms: list[str]) -> dict:
+        """
+        Тексты для нескольких платформ.
+
+        В режиме TEXT_GENERATION_MODE=batch все варианты запрашиваются одним
+        вызовом GPT. Варианты, не прошедшие проверку длины, перегенерируются
+        отдельно - остальные не трогаются.
+
+        Returns:
+            {platform: text}
+        """
+        platforms = list(dict.fromkeys(platforms))
+        if not self.client:
+            print("[ОШИБКА] Сначала вызовите connect()")
+            return {platform: "" for platform in platforms}
+
+        if TEXT_GENERATION_MODE != 'batch' or len(platforms) < 2:
+            return {platform: self.generate_text(project, topic, platform) for platform in platforms}
+
+        texts = self._generate_texts_batch(project, topic, platforms)
+        failed = [p for p in platforms if not self.is_valid_length(p, texts.get(p, ''))]
+
+        # Несколько неудачных вариантов - снова одним запросом
+        if len(failed) > 1:
+            print(f"[!] Перегенерация вариантов: {', '.join(failed)}")
+            retry = self._generate_texts_batch(project, topic, failed)
+            for platform in failed:
+                if self.is_valid_length(platform, retry.get(platform, '')) or not texts.get(platform):
+                    texts[platform] = retry.get(platform, '')
+            failed = [p for p in failed if not self.is_valid_length(p, texts.get(p, ''))]
+
+        # Оставшиеся - по одному
+        for platform in failed:
+            print(f"[!] Вариант '{platform}' не прошёл проверку длины, генерирую отдельно")
+            text = self.generate_text(project, topic, platform)
+            if self.is_valid_length(platform, text) or not texts.get(platform):
+                texts[platform] = text
+
+        return texts
+
+    def image_backend(self, project: str, backend: str = '') -> str:
+        """Какой генератор картинок использовать: из строки таблицы, настроек проекта или по умолчанию."""
+        if self.meter.budget_state() != BUDGET_NORMAL:
+            # Бюджет на исходе - DALL-E не используем
+            return 'card'
+        backend = (backend or PROJECT_IMAGE_BACKENDS.get(project) or IMAGE_BACKEND).strip().lower()
+        return backend if backend in ('dalle', 'card') else 'dalle'
+
+    def image_spec(self, project: str, value: str = '') -> tuple[str, int]:
+        """
+        Разбор колонки Image: 'dalle', 'card', 'dalle:4' или '4'.
+
+        Returns:
+            (генератор или '' - по настройкам, количество картинок)
+        """
+        backend, _, count = (value or '').strip().lower().partition(':')
+        if backend.isdigit():
+            backend, count = '', backend
+        count = int(count) if count.isdigit() else PROJECT_ALBUM_SIZES.get(project, ALBUM_SIZE)
+        return backend, max(1, min(count, self.ALBUM_MAX))
+
+    def generate_image(self, project: str, topic: str, backend: str = '') -> str:
+        """
+        Генерация изображения.
+
+        Args:
+            project: Название проекта
+            topic: Тема для изображения
+            backend: 'dalle' или 'card' (по умолчанию - из настроек проекта)
+
+        Returns:
+            Путь к сохранённому изображению
+        """
+        paths = self.generate_images(project, topic, backend)
+        return paths[0] if paths else ""
+
+    def generate_images(self, project: str, topic: str, backend: str = '', count: int = 1) -> list[str]:
+        """
+        Генерация картинок для поста или альбома.
+
+        Картинки альбома рисуются по вариантам промпта одновременно (не больше
+        DALLE_CONCURRENCY запросов сразу), поэтому альбом готов примерно за
+        время одной картинки. Карточка всегда одна.
+
+        Returns:
+            Пути к сохранённым изображениям (пустой список, если не получилось)
+        """
+        if self.image_backend(project, backend) == 'card':
+            return self._card_images(project, topic)
+
+        if time.time() < self._dalle_paused_until:
+            print("[!] DALL-E временно отключён после ошибок, рисую карточку")
+            return self._card_images(project, topic)
+
+        count = max(1, min(count, self.ALBUM_MAX))
+        if count == 1:
+            paths = [self.generate_dalle_image(project, topic)]
+        else:
+            print(f"[ГЕНЕРАЦИЯ] Альбом из {count} изображений")
+            variations = [''] + [self.IMAGE_VARIATIONS[i % len(self.IMAGE_VARIATIONS)] for i in range(count - 1)]
+            with metrics.span('generate_album', project):
+                with ThreadPoolExecutor(max_workers=min(count, max(1, DALLE_CONCURRENCY))) as pool:
+                    paths = list(pool.map(
+                        lambda args: self.generate_dalle_image(project, topic, *args),
+                        [(variation, idx) for idx, variation in enumerate(variations)],
+                    ))
+
+        paths = [path for path in paths if path]
+        if paths:
+            self._dalle_failures = 0
+            if len(paths) < count:
+                print(f"[!] Альбом: получено {len(paths)} из {count} изображений")
+            return paths
+
+        self._dalle_failures += 1
+        if self._dalle_failures >= DALLE_MAX_FAILURES:
+            self._dalle_paused_until = time.time() + DALLE_COOLDOWN_SECONDS
+            print(f"[!] DALL-E: {self._dalle_failures} ошибок подряд, "
+                  f"пауза {DALLE_COOLDOWN_SECONDS} сек.")
+
+        if IMAGE_FALLBACK:
+            print("[!] Использую локальную карточку вместо DALL-E")
+            return self._card_images(project, topic)
+        return []
+
+    def _card_images(self, project: str, topic: str) -> list[str]:
+        path = self.render_card(project, topic)
+        return [path] if path else []
+
+    def render_card(self, project: str, topic: str) -> str:
+        """Локальная карточка с темой поста в стиле проекта."""
+        with metrics.span('render_card', project) as span:
+            try:
+                filepath = self.card_renderer.render(project, topic, self.CARD_STYLES.get(project))
+                print(f"[OK] Карточка сохранена: {filepath}")
+                return filepath
+            except Exception as e:
+                span.fail()
+                print(f"[ОШИБКА] Не удалось нарисовать карточку: {e}")
+                return ""
+
+    def generate_dalle_image(self, project: str, topic: str, variation: str = '', index: int = 0) -> str:
         """
         Генерация изображения через DALL-E.
 
         Args:
             project: Название проекта
             topic: Тема для изображения
+            variation: Уточнение кадра (для картинок альбома)
+            index: Номер картинки в альбоме (для имени файла)
 
         Returns:
             Путь к сохранённому изображению
@@ -132,33 +506,44 @@ class ContentGenerator:
             print("[ОШИБКА] Сначала вызовите connect()")
             return ""
 
-        # Стили изображений для проектов
-        image_styles = {
-            'RouteOfRest': 'красивое фото природы, путешествия, яркие цвета, профессиональная фотография',
-            'NBot': 'современный минималистичный дизайн, технологии, финансы, синие и зелёные тона',
-        }
-
-        style = image_styles.get(project, 'профессиональный стиль')
+        style = self.IMAGE_STYLES.get(project, 'профессиональный стиль')
 
         prompt = f"{topic}. Стиль: {style}. Без текста на изображении."
+        if variation:
+            prompt = f"{topic}, {variation}. Стиль: {style}. Без текста на изображении."
 
         try:
-            response = self.client.images.generate(
-                model="dall-e-3",
-                prompt=prompt,
-                size="1024x1024",
-                quality="standard",
-                n=1,
-            )
-
+            with self._dalle_slots, metrics.span('generate_image', project):
+                # Не ответил за DALLE_TIMEOUT - TimeoutError, дальше карточка
+                response = self.hedger.call(
+                    lambda: self.async_client.images.generate(
+                        model="dall-e-3",
+                        prompt=prompt,
+                        size="1024x1024",
+                        quality="standard",
+                        n=1,
+                    ),
+                    'image', DALLE_TIMEOUT,
+                    hedge=HEDGE_IMAGES and self.meter.budget_state() == BUDGET_NORMAL,
+                    # Дубль занимает свой слот DALLE_CONCURRENCY, а отменённая
+                    # картинка, скорее всего, всё равно оплачена
+                    slots=self._dalle_slots,
+                    on_abandoned=lambda count: self.meter.record_images(project, 'dall-e-3', count),
+                )
+
+            self.meter.record_images(project, 'dall-e-3')
             image_url = response.data[0].url
 
             # Скачиваем изображение
-            image_response = requests.get(image_url)
+            with metrics.span('image_download', project) as span:
+                image_response = requests.get(image_url, timeout=DALLE_TIMEOUT)
+                if image_response.status_code != 200:
+                    span.fail()
+
             if image_response.status_code == 200:
                 # Создаём уникальное имя файла
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                filename = f"{project}_{timestamp}.png"
+                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+                filename = f"{project}_{timestamp}_{index}.png"
                 filepath = os.path.join(self.temp_dir, filename)
 
                 with open(filepath, 'wb') as f:
@@ -174,21 +559,30 @@ class ContentGenerator:
             print(f"[ОШИБКА] Не удалось сгенерировать изображение: {e}")
             return ""
 
-    def generate_content(self, project: str, topic: str, platform: str = 'tg') -> dict:
+    def generate_contents(self, project: str, topic: str, platforms: list[str], image_backend: str = '',
+                          image_count: int = 1) -> dict:
         """
-        Полная генерация контента: текст + изображение.
+        Контент сразу для нескольких платформ: тексты одним запросом
+        и общие изображения (одно или альбом из image_count).
 
         Returns:
-            {'text': str, 'image_path': str}
+            {platform: {'text': str, 'image_path': str, 'image_paths': list}}
         """
-        print(f"\n[ГЕНЕРАЦИЯ] Проект: {project}, Тема: {topic}")
+        if not platforms:
+            return {}
+
+        print(f"\n[ГЕНЕРАЦИЯ] Проект: {project}, Тема: {topic}, Платформы: {', '.join(platforms)}")
 
-        text = self.generate_text(project, topic, platform)
-        image_path = self.generate_image(project, topic)
+        texts = self.generate_texts(project, topic, platforms)
+        image_paths = self.generate_images(project, topic, image_backend, image_count)
 
         return {
-            'text': text,
-            'image_path': image_path,
+            platform: {
+                'text': texts.get(platform, ''),
+                'image_path': image_paths[0] if image_paths else '',
+                'image_paths': image_paths,
+            }
+            for platform in platforms
         }
 
 
@@ -196,11 +590,11 @@ class ContentGenerator:
 if __name__ == "__main__":
     generator = ContentGenerator()
     if generator.connect():
-        content = generator.generate_content(
+        content = generator.generate_contents(
             project="RouteOfRest",
             topic="Топ-5 мест для отдыха в Турции",
-            platform="tg"
-        )
+            platforms=["tg"],
+        )['tg']
         print("\n--- РЕЗУЛЬТАТ ---")
         print(f"Текст:\n{content['text'][:200]}...")
-        print(f"\nИзображение: {content['image_path']}")
+        print(f"\nИзображения: {', '.join(content['image_paths'])}")
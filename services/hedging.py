@@ -0,0 +1,143 @@
+"""
+Модуль запросов к OpenAI с дедлайном и хеджированием.
+
+Запрос выполняется через AsyncOpenAI в отдельном потоке с event loop.
+Если ответа нет дольше наблюдаемого p95 задержки, отправляется
+дублирующий запрос: побеждает первый ответ, второй запрос отменяется
+(соединение закрывается). Доля дублей ограничена, чтобы не тратить
+лимиты и бюджет. Если за дедлайн ответа нет, вызывающий код получает
+TimeoutError и переходит к более дешёвому варианту (модель подешевле,
+локальная карточка вместо DALL-E).
+"""
+
+import asyncio
+import threading
+import time
+from typing import Awaitable, Callable, Optional
+
+from services.metrics import metrics
+
+
+class Hedger:
+    """Запуск async-запросов с дедлайном и ограниченным хеджированием."""
+
+    def __init__(self, max_ratio: float = 0.1, quantile: float = 0.95, min_samples: int = 20,
+                 min_delay: float = 1.0):
+        """
+        Args:
+            max_ratio: Максимальная доля дублирующих запросов (0 - без хеджирования)
+            quantile: После какого квантиля задержки отправлять дубль
+            min_samples: Сколько замеров нужно, чтобы доверять квантилю
+            min_delay: Дубль - не раньше чем через столько секунд
+        """
+        self.max_ratio = max_ratio
+        self.quantile = quantile
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self._calls = 0
+        self._hedges = 0
+        self._lock = threading.Lock()
+        self._loop = None
+
+    def _event_loop(self) -> asyncio.AbstractEventLoop:
+        """Event loop в фоновом потоке (один на процесс - на нём живёт AsyncOpenAI)."""
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name='openai-async', daemon=True).start()
+            return self._loop
+
+    def hedge_delay(self, kind: str) -> Optional[float]:
+        """Через сколько секунд отправлять дубль (None - пока не хеджируем)."""
+        if self.max_ratio <= 0:
+            return None
+        delay = metrics.quantile(f"openai_{kind}", self.quantile, self.min_samples)
+        return None if delay is None else max(delay, self.min_delay)
+
+    def _allow_hedge(self) -> bool:
+        """Дубль разрешён, если их доля не превысит max_ratio (плюс один на старте)."""
+        with self._lock:
+            if self._hedges >= self.max_ratio * self._calls + 1:
+                return False
+            self._hedges += 1
+            return True
+
+    def call(self, make_request: Callable[[], Awaitable], kind: str, deadline: float,
+             hedge: bool = True, slots: threading.Semaphore = None,
+             on_abandoned: Callable[[int], None] = None):
+        """
+        Выполнить запрос с дедлайном (из любого потока).
+
+        Args:
+            make_request: Функция без аргументов, возвращающая корутину запроса
+                (вызывается повторно для дубля)
+            kind: Тип запроса для статистики задержек: text, text_batch, image
+            deadline: Максимальное время ожидания, секунды
+            hedge: Разрешить дублирующий запрос
+            slots: Семафор одновременных запросов: дубль занимает свой слот
+                (нет свободного - дубля нет), исходный запрос - уже в слоте
+            on_abandoned: Вызывается (в этом потоке) с числом запросов, которые
+                были отменены до ответа - OpenAI может списать за них деньги
+
+        Raises:
+            TimeoutError: Ответа нет за deadline секунд
+        """
+        with self._lock:
+            self._calls += 1
+        delay = self.hedge_delay(kind) if hedge else None
+        race = {'abandoned': 0}
+        future = asyncio.run_coroutine_threadsafe(
+            asyncio.wait_for(self._race(make_request, kind, delay, slots, race), deadline),
+            self._event_loop(),
+        )
+        try:
+            return future.result()
+        except asyncio.TimeoutError:
+            metrics.inc('openai_timeouts', kind=kind)
+            raise TimeoutError(f"OpenAI не ответил за {deadline} сек.")
+        finally:
+            if race['abandoned']:
+                metrics.inc('openai_abandoned', race['abandoned'], kind=kind)
+                if on_abandoned:
+                    on_abandoned(race['abandoned'])
+
+    def _hedge_slot(self, slots: Optional[threading.Semaphore]) -> bool:
+        """Место для дубля: свободный слот семафора и лимит доли дублей."""
+        if slots is not None and not slots.acquire(blocking=False):
+            return False
+        if self._allow_hedge():
+            return True
+        if slots is not None:
+            slots.release()
+        return False
+
+    async def _race(self, make_request: Callable[[], Awaitable], kind: str, delay: Optional[float],
+                    slots: Optional[threading.Semaphore], race: dict):
+        started = time.perf_counter()
+        tasks = {asyncio.ensure_future(make_request())}
+        try:
+            if delay is not None:
+                done, _ = await asyncio.wait(tasks, timeout=delay)
+                if not done and self._hedge_slot(slots):
+                    print(f"[!] OpenAI ({kind}): нет ответа {delay:.1f} сек. (p{int(self.quantile * 100)}), "
+                          f"отправляю дублирующий запрос")
+                    metrics.inc('openai_hedges', kind=kind)
+                    duplicate = asyncio.ensure_future(make_request())
+                    if slots is not None:
+                        duplicate.add_done_callback(lambda _: slots.release())
+                    tasks.add(duplicate)
+
+            while True:
+                done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    tasks.discard(task)
+                    if task.exception() is None:
+                        metrics.observe(f"openai_{kind}", time.perf_counter() - started)
+                        return task.result()
+                    if not tasks:
+                        raise task.exception()
+        finally:
+            # Проигравший (или все - при дедлайне) запрос отменяем
+            race['abandoned'] = sum(1 for task in tasks if not task.done())
+            for task in tasks:
+                task.cancel()
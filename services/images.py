@@ -0,0 +1,186 @@
+"""
+Модуль локальной генерации изображений.
+Рисует брендированные карточки (градиент, заголовок, логотип) через Pillow -
+быстрая и бесплатная альтернатива DALL-E.
+"""
+
+import os
+from datetime import datetime
+from functools import lru_cache
+from typing import Optional
+
+from PIL import Image, ImageDraw, ImageFont
+
+
+# Шрифты с кириллицей, которые ищем в системе
+FONT_CANDIDATES = [
+    '/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf',
+    '/usr/share/fonts/dejavu/DejaVuSans-Bold.ttf',
+    '/usr/share/fonts/truetype/liberation/LiberationSans-Bold.ttf',
+    '/Library/Fonts/Arial Bold.ttf',
+    'C:/Windows/Fonts/arialbd.ttf',
+]
+
+# Оформление по умолчанию (если для проекта нет стиля)
+DEFAULT_CARD_STYLE = {
+    'gradient': ('#2b5876', '#4e4376'),
+    'text_color': '#ffffff',
+    'accent': '#ffffff',
+    'label': '',
+    'logo': None,
+}
+
+
+@lru_cache(maxsize=None)
+def _find_font(preferred: str = '') -> str:
+    """Путь к шрифту: из настроек или первый найденный в системе."""
+    for path in [preferred] + FONT_CANDIDATES:
+        if path and os.path.exists(path):
+            return path
+    return ''
+
+
+@lru_cache(maxsize=64)
+def _font(path: str, size: int):
+    """Загруженный шрифт (кэшируется - загрузка TTF дорогая)."""
+    if path:
+        return ImageFont.truetype(path, size)
+    try:
+        return ImageFont.load_default(size=size)
+    except TypeError:
+        # Pillow < 10.1 не умеет менять размер встроенного шрифта
+        return ImageFont.load_default()
+
+
+@lru_cache(maxsize=4096)
+def _text_width(path: str, size: int, text: str) -> float:
+    """Ширина строки в пикселях (кэш ширин слов)."""
+    return _font(path, size).getlength(text)
+
+
+@lru_cache(maxsize=32)
+def _gradient(size: tuple, top: str, bottom: str) -> Image.Image:
+    """Вертикальный градиент (кэшируется по цветам и размеру)."""
+    mask = Image.linear_gradient('L').resize(size)
+    return Image.composite(
+        Image.new('RGB', size, bottom),
+        Image.new('RGB', size, top),
+        mask,
+    )
+
+
+@lru_cache(maxsize=16)
+def _logo(path: str, height: int) -> Optional[Image.Image]:
+    """Логотип, приведённый к нужной высоте."""
+    if not path or not os.path.exists(path):
+        return None
+    logo = Image.open(path).convert('RGBA')
+    width = max(1, int(logo.width * height / logo.height))
+    return logo.resize((width, height), Image.LANCZOS)
+
+
+@lru_cache(maxsize=1024)
+def _layout(text: str, path: str, max_width: int, max_height: int,
+            max_size: int, min_size: int) -> tuple[int, tuple]:
+    """
+    Подобрать размер шрифта и перенос строк, чтобы текст влез в рамку.
+
+    Returns:
+        (размер шрифта, строки)
+    """
+    words = text.split()
+    size = max_size
+    while True:
+        space = _text_width(path, size, ' ')
+        lines = []
+        current = []
+        current_width = 0.0
+        for word in words:
+            word_width = _text_width(path, size, word)
+            width = word_width if not current else current_width + space + word_width
+            if current and width > max_width:
+                lines.append(' '.join(current))
+                current = [word]
+                current_width = word_width
+            else:
+                current.append(word)
+                current_width = width
+        if current:
+            lines.append(' '.join(current))
+
+        line_height = int(size * 1.25)
+        widest = max((_text_width(path, size, line) for line in lines), default=0)
+        if (len(lines) * line_height <= max_height and widest <= max_width) or size <= min_size:
+            return size, tuple(lines)
+        size = max(min_size, int(size * 0.9))
+
+
+class CardRenderer:
+    """Рендерер карточек для постов."""
+
+    def __init__(self, output_dir: str, size: tuple = (1080, 1080), font_path: str = ''):
+        """
+        Args:
+            output_dir: Куда сохранять картинки
+            size: Размер карточки (ширина, высота)
+            font_path: TTF шрифт. Если не указан, ищется системный с кириллицей.
+        """
+        self.output_dir = output_dir
+        self.size = tuple(size)
+        self.font_path = _find_font(font_path)
+
+    def draw(self, title: str, style: dict = None) -> Image.Image:
+        """Нарисовать карточку и вернуть изображение."""
+        style = {**DEFAULT_CARD_STYLE, **(style or {})}
+        width, height = self.size
+        margin = width // 12
+
+        image = _gradient(self.size, *style['gradient']).copy()
+        draw = ImageDraw.Draw(image)
+
+        # Акцентная полоса над заголовком
+        draw.rectangle(
+            (margin, margin, margin + width // 8, margin + max(4, height // 120)),
+            fill=style['accent'],
+        )
+
+        # Заголовок: подбираем размер, чтобы влез в центральную часть
+        size, lines = _layout(
+            title.strip(), self.font_path,
+            width - 2 * margin, int(height * 0.6),
+            width // 10, width // 30,
+        )
+        font = _font(self.font_path, size)
+        line_height = int(size * 1.25)
+        y = (height - line_height * len(lines)) // 2
+        for line in lines:
+            draw.text((margin, y), line, font=font, fill=style['text_color'])
+            y += line_height
+
+        # Логотип и подпись проекта внизу
+        footer_height = height // 12
+        footer_y = height - margin - footer_height
+        x = margin
+        logo = _logo(style.get('logo') or '', footer_height)
+        if logo:
+            image.paste(logo, (x, footer_y), logo)
+            x += logo.width + margin // 3
+        if style.get('label'):
+            label_font = _font(self.font_path, footer_height // 2)
+            draw.text((x, footer_y + footer_height // 4), style['label'],
+                      font=label_font, fill=style['text_color'])
+
+        return image
+
+    def render(self, project: str, title: str, style: dict = None) -> str:
+        """
+        Нарисовать карточку и сохранить в JPEG.
+
+        Returns:
+            Путь к сохранённому изображению
+        """
+        image = self.draw(title, style)
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        filepath = os.path.join(self.output_dir, f"{project}_card_{timestamp}.jpg")
+        image.save(filepath, 'JPEG', quality=90)
+        return filepath
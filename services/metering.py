@@ -0,0 +1,204 @@
+"""
+Модуль учёта расходов OpenAI.
+
+Записывает токены GPT и количество картинок DALL-E по проектам,
+платформам и запускам в локальную SQLite базу, считает стоимость
+и следит за дневным и месячным бюджетом.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from services.metrics import metrics
+
+
+# Цены OpenAI, USD (за 1 токен / за 1 картинку)
+PRICES = {
+    'gpt-4o-mini': {'prompt': 0.15 / 1_000_000, 'completion': 0.60 / 1_000_000},
+    'gpt-4.1-nano': {'prompt': 0.10 / 1_000_000, 'completion': 0.40 / 1_000_000},
+    'gpt-4o': {'prompt': 2.50 / 1_000_000, 'completion': 10.00 / 1_000_000},
+    'dall-e-3': {'image': 0.040},  # 1024x1024, standard
+}
+
+# Режимы бюджета
+BUDGET_NORMAL = 'normal'        # Всё как обычно
+BUDGET_CHEAP = 'cheap'          # Почти исчерпан: дешёвая модель, локальные карточки, паузы
+BUDGET_EXHAUSTED = 'exhausted'  # Исчерпан: только задания с высоким приоритетом
+
+
+class UsageMeter:
+    """Учёт расхода токенов и картинок с бюджетом."""
+
+    # Сколько секунд расход за день и месяц берётся из памяти, а не из базы
+    # (режим бюджета проверяется на каждый запрос к OpenAI)
+    SPENT_TTL = 10.0
+
+    def __init__(self, path: str, daily_budget: float = 0, monthly_budget: float = 0,
+                 soft_ratio: float = 0.8):
+        """
+        Args:
+            path: Файл SQLite базы
+            daily_budget: Бюджет на день, USD (0 - без ограничения)
+            monthly_budget: Бюджет на месяц, USD (0 - без ограничения)
+            soft_ratio: Доля бюджета, после которой включается экономный режим
+        """
+        self.path = path
+        self.daily_budget = daily_budget
+        self.monthly_budget = monthly_budget
+        self.soft_ratio = soft_ratio
+        self.run_id = uuid.uuid4().hex[:12]
+        self._lock = threading.Lock()
+        # Расход {'day': (день, USD), 'month': (месяц, USD)} и время чтения из базы
+        self._spent = {}
+        self._spent_at = 0.0
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS usage (
+                ts REAL,
+                day TEXT,
+                month TEXT,
+                run TEXT,
+                project TEXT,
+                platform TEXT,
+                model TEXT,
+                prompt_tokens INTEGER,
+                completion_tokens INTEGER,
+                images INTEGER,
+                cost REAL
+            )
+        """)
+        self._db.execute("CREATE INDEX IF NOT EXISTS usage_day ON usage (day)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS usage_month ON usage (month)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS usage_run ON usage (run)")
+        self._db.commit()
+
+    def start_run(self):
+        """Начать новый запуск (для сводки по запуску)."""
+        self.run_id = uuid.uuid4().hex[:12]
+
+    def _record(self, project: str, platform: str, model: str,
+                prompt_tokens: int = 0, completion_tokens: int = 0, images: int = 0) -> float:
+        price = PRICES.get(model, {})
+        cost = (prompt_tokens * price.get('prompt', 0)
+                + completion_tokens * price.get('completion', 0)
+                + images * price.get('image', 0))
+
+        now = datetime.now()
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO usage VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (time.time(), now.strftime('%Y-%m-%d'), now.strftime('%Y-%m'), self.run_id,
+                 project, platform, model, prompt_tokens, completion_tokens, images, cost),
+            )
+            self._db.commit()
+            # Свой расход сразу виден в режиме бюджета, чужой - после SPENT_TTL
+            for period, (key, value) in self._spent.items():
+                self._spent[period] = (key, value + cost)
+
+        metrics.inc('openai_cost_usd', cost, project=project, model=model)
+        return cost
+
+    def record_tokens(self, project: str, platform: str, model: str, usage) -> float:
+        """Записать токены из response.usage ответа chat.completions."""
+        if usage is None:
+            return 0.0
+        prompt_tokens = getattr(usage, 'prompt_tokens', 0) or 0
+        completion_tokens = getattr(usage, 'completion_tokens', 0) or 0
+        metrics.inc('openai_tokens', prompt_tokens, project=project, kind='prompt')
+        metrics.inc('openai_tokens', completion_tokens, project=project, kind='completion')
+        return self._record(project, platform, model,
+                            prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+
+    def record_images(self, project: str, model: str, count: int = 1) -> float:
+        """Записать сгенерированные картинки."""
+        metrics.inc('openai_images', count, project=project, model=model)
+        return self._record(project, '', model, images=count)
+
+    def spent(self, period: str = 'day') -> float:
+        """
+        Потрачено за текущий день ('day') или месяц ('month'), USD.
+
+        Значение из базы кэшируется на SPENT_TTL секунд (другие процессы
+        пишут в ту же базу), свой расход добавляется к нему сразу.
+        """
+        now = datetime.now()
+        column, value = ('day', now.strftime('%Y-%m-%d')) if period == 'day' else ('month', now.strftime('%Y-%m'))
+        with self._lock:
+            cached = self._spent.get(column)
+            if cached and cached[0] == value and time.monotonic() - self._spent_at < self.SPENT_TTL:
+                return cached[1]
+
+            row = self._db.execute(
+                f"SELECT COALESCE(SUM(cost), 0) FROM usage WHERE {column} = ?", (value,)
+            ).fetchone()
+            if not self._spent or time.monotonic() - self._spent_at >= self.SPENT_TTL:
+                self._spent = {}
+                self._spent_at = time.monotonic()
+            self._spent[column] = (value, row[0])
+        return row[0]
+
+    def budget_ratio(self) -> float:
+        """Максимальная доля израсходованного бюджета (день или месяц)."""
+        ratios = [0.0]
+        if self.daily_budget:
+            ratios.append(self.spent('day') / self.daily_budget)
+        if self.monthly_budget:
+            ratios.append(self.spent('month') / self.monthly_budget)
+        return max(ratios)
+
+    def budget_state(self) -> str:
+        """Режим работы по бюджету: normal, cheap или exhausted."""
+        ratio = self.budget_ratio()
+        if ratio >= 1:
+            return BUDGET_EXHAUSTED
+        if ratio >= self.soft_ratio:
+            return BUDGET_CHEAP
+        return BUDGET_NORMAL
+
+    def run_summary(self) -> dict:
+        """Расход текущего запуска."""
+        with self._lock:
+            rows = self._db.execute(
+                """
+                SELECT project, SUM(prompt_tokens), SUM(completion_tokens), SUM(images), SUM(cost)
+                FROM usage WHERE run = ? GROUP BY project
+                """,
+                (self.run_id,),
+            ).fetchall()
+
+        projects = {
+            project: {
+                'prompt_tokens': prompt or 0,
+                'completion_tokens': completion or 0,
+                'images': images or 0,
+                'cost_usd': round(cost or 0, 4),
+            }
+            for project, prompt, completion, images, cost in rows
+        }
+        return {
+            'run': self.run_id,
+            'cost_usd': round(sum(p['cost_usd'] for p in projects.values()), 4),
+            'projects': projects,
+        }
+
+    def format_summary(self) -> str:
+        """Сводка расходов для вывода в конце запуска."""
+        summary = self.run_summary()
+        lines = [f"Расход OpenAI за запуск: ${summary['cost_usd']:.4f}"]
+        for project, usage in summary['projects'].items():
+            lines.append(
+                f"  {project}: ${usage['cost_usd']:.4f} "
+                f"(токены {usage['prompt_tokens']}/{usage['completion_tokens']}, "
+                f"картинок {usage['images']})"
+            )
+
+        day = f"${self.spent('day'):.2f}" + (f" из ${self.daily_budget:.2f}" if self.daily_budget else "")
+        month = f"${self.spent('month'):.2f}" + (f" из ${self.monthly_budget:.2f}" if self.monthly_budget else "")
+        lines.append(f"  За день: {day}, за месяц: {month}, режим: {self.budget_state()}")
+        return "\n".join(lines)
@@ -0,0 +1,274 @@
+"""
+Модуль метрик.
+Замеряет длительность этапов (чтение таблицы, генерация, скачивание,
+публикация) и экспортирует статистику в формате Prometheus и JSON.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+
+# Границы корзин гистограммы длительности (секунды)
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+
+# Сколько последних замеров хранить на этап для квантилей
+RECENT_WINDOW = 500
+
+
+class Span:
+    """Замер одного этапа. Результат по умолчанию 'ok'."""
+
+    def __init__(self, stage: str, project: str = '', platform: str = ''):
+        self.stage = stage
+        self.project = project
+        self.platform = platform
+        self.outcome = 'ok'
+
+    def fail(self, outcome: str = 'error'):
+        """Пометить этап как неуспешный."""
+        self.outcome = outcome
+
+
+class Metrics:
+    """Потокобезопасный реестр гистограмм и счётчиков."""
+
+    def __init__(self, buckets: tuple = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        # (stage, project, platform, outcome) -> [counts по корзинам, sum, count]
+        self._histograms = {}
+        # (name, ((label, value), ...)) -> value
+        self._counters = defaultdict(float)
+        self._gauges = {}
+        # stage -> последние длительности (для p50/p95)
+        self._recent = defaultdict(lambda: deque(maxlen=RECENT_WINDOW))
+        # Статистика текущего запуска AutoPost.run
+        self._run_durations = defaultdict(list)
+        self._run_outcomes = defaultdict(lambda: defaultdict(int))
+        self._run_counters = defaultdict(float)
+        self._run_started = None
+        # Кто хочет знать о завершении этапов (например, профайлер)
+        self._span_hooks = []
+
+    @contextmanager
+    def span(self, stage: str, project: str = '', platform: str = ''):
+        """
+        Замерить этап.
+
+        Пример:
+            with metrics.span('generate_text', project, platform) as span:
+                ...
+                if not text:
+                    span.fail()
+        """
+        span = Span(stage, project, platform)
+        start = time.perf_counter()
+        try:
+            yield span
+        except BaseException:
+            span.outcome = 'error'
+            raise
+        finally:
+            seconds = time.perf_counter() - start
+            self.observe(stage, seconds,
+                         project=span.project, platform=span.platform, outcome=span.outcome)
+            for hook in self._span_hooks:
+                hook(stage, span.project, span.platform, seconds)
+
+    def on_span(self, hook):
+        """Вызывать hook(stage, project, platform, seconds) после каждого этапа."""
+        if hook not in self._span_hooks:
+            self._span_hooks.append(hook)
+
+    def observe(self, stage: str, seconds: float, project: str = '',
+                platform: str = '', outcome: str = 'ok'):
+        """Записать длительность этапа."""
+        key = (stage, project or '', platform or '', outcome)
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = [[0] * len(self.buckets), 0.0, 0]
+                self._histograms[key] = hist
+            for idx, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    hist[0][idx] += 1
+            hist[1] += seconds
+            hist[2] += 1
+
+            self._recent[stage].append(seconds)
+            self._run_durations[stage].append(seconds)
+            self._run_outcomes[stage][outcome] += 1
+
+    def inc(self, name: str, value: float = 1, **labels):
+        """Увеличить счётчик."""
+        key = (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+        with self._lock:
+            self._counters[key] += value
+            self._run_counters[name] += value
+
+    def gauge(self, name: str, value: float, **labels):
+        """Установить текущее значение показателя (память, длина очереди...)."""
+        key = (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+        with self._lock:
+            self._gauges[key] = value
+
+    def quantile(self, stage: str, q: float, min_samples: int = 1) -> Optional[float]:
+        """Квантиль длительности этапа по последним замерам (None, если замеров меньше min_samples)."""
+        with self._lock:
+            samples = sorted(self._recent.get(stage, ()))
+        if len(samples) < min_samples:
+            return None
+        return _quantile(samples, q)
+
+    # --- Сводка по запуску ---
+
+    def start_run(self):
+        """Начать сбор статистики нового запуска."""
+        with self._lock:
+            self._run_durations.clear()
+            self._run_outcomes.clear()
+            self._run_counters.clear()
+            self._run_started = time.time()
+
+    def run_summary(self) -> dict:
+        """Сводка по текущему запуску (для JSON)."""
+        with self._lock:
+            started = self._run_started or time.time()
+            stages = {}
+            for stage, durations in self._run_durations.items():
+                ordered = sorted(durations)
+                outcomes = dict(self._run_outcomes[stage])
+                stages[stage] = {
+                    'count': len(ordered),
+                    'errors': sum(n for outcome, n in outcomes.items() if outcome != 'ok'),
+                    'outcomes': outcomes,
+                    'total_s': round(sum(ordered), 3),
+                    'avg_s': round(sum(ordered) / len(ordered), 3),
+                    'p50_s': round(_quantile(ordered, 0.5), 3),
+                    'p95_s': round(_quantile(ordered, 0.95), 3),
+                    'max_s': round(ordered[-1], 3),
+                }
+            counters = {name: value for name, value in self._run_counters.items()}
+
+        return {
+            'started': datetime.fromtimestamp(started).isoformat(timespec='seconds'),
+            'duration_s': round(time.time() - started, 3),
+            'stages': stages,
+            'counters': counters,
+        }
+
+    def write_run_summary(self, path: str) -> dict:
+        """Сохранить сводку запуска в JSON-файл."""
+        summary = self.run_summary()
+        _atomic_write(path, json.dumps(summary, ensure_ascii=False, indent=2))
+        return summary
+
+    # --- Экспорт в Prometheus ---
+
+    def render_prometheus(self) -> str:
+        """Метрики в текстовом формате Prometheus."""
+        lines = [
+            '# HELP autopost_stage_duration_seconds Длительность этапов AutoPost',
+            '# TYPE autopost_stage_duration_seconds histogram',
+        ]
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            counters = sorted(self._counters.items())
+            gauges = sorted(self._gauges.items())
+
+        stage_totals = defaultdict(int)
+        for (stage, project, platform, outcome), (counts, total, count) in histograms:
+            labels = _format_labels(stage=stage, project=project, platform=platform, outcome=outcome)
+            for bound, bucket_count in zip(self.buckets, counts):
+                lines.append(
+                    f'autopost_stage_duration_seconds_bucket{{{labels},le="{bound}"}} {bucket_count}'
+                )
+            lines.append(f'autopost_stage_duration_seconds_bucket{{{labels},le="+Inf"}} {count}')
+            lines.append(f'autopost_stage_duration_seconds_sum{{{labels}}} {total:.6f}')
+            lines.append(f'autopost_stage_duration_seconds_count{{{labels}}} {count}')
+            stage_totals[(stage, project, platform, outcome)] += count
+
+        lines.append('# HELP autopost_stage_total Количество выполненных этапов')
+        lines.append('# TYPE autopost_stage_total counter')
+        for (stage, project, platform, outcome), count in sorted(stage_totals.items()):
+            labels = _format_labels(stage=stage, project=project, platform=platform, outcome=outcome)
+            lines.append(f'autopost_stage_total{{{labels}}} {count}')
+
+        declared = set()
+        for kind, series in (('counter', counters), ('gauge', gauges)):
+            for (name, label_items), value in series:
+                metric = f'autopost_{name}'
+                if metric not in declared:
+                    lines.append(f'# TYPE {metric} {kind}')
+                    declared.add(metric)
+                labels = _format_labels(**dict(label_items))
+                lines.append(f'{metric}{{{labels}}} {value:g}' if labels else f'{metric} {value:g}')
+
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, path: str):
+        """Сохранить метрики в файл (для textfile collector node_exporter)."""
+        _atomic_write(path, self.render_prometheus())
+
+    def serve(self, port: int, host: str = '127.0.0.1') -> ThreadingHTTPServer:
+        """Запустить HTTP эндпоинт /metrics в фоновом потоке."""
+        registry = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = registry.render_prometheus().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), MetricsHandler)
+        thread = threading.Thread(target=server.serve_forever, name='metrics-http', daemon=True)
+        thread.start()
+        print(f"[OK] Метрики доступны на http://{host}:{server.server_address[1]}/metrics")
+        return server
+
+
+def _quantile(ordered: list, q: float) -> Optional[float]:
+    """Квантиль по отсортированному списку (ближайший ранг)."""
+    if not ordered:
+        return None
+    idx = min(len(ordered) - 1, max(0, int(round(q * (len(ordered) - 1)))))
+    return ordered[idx]
+
+
+def _format_labels(**labels) -> str:
+    """Форматирование меток Prometheus: a="1",b="2"."""
+    parts = []
+    for name, value in labels.items():
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        parts.append(f'{name}="{value}"')
+    return ','.join(parts)
+
+
+def _atomic_write(path: str, content: str):
+    """Запись файла через временный файл, чтобы читатели не видели половину."""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+# Общий реестр метрик приложения
+metrics = Metrics()
@@ -0,0 +1,252 @@
+"""
+Модуль профилирования (режим --profile).
+
+Во время работы собирает:
+- CPU профиль cProfile (главный поток и потоки обработки заданий);
+- снимки памяти tracemalloc на границах этапов (после каждого
+  metrics.span) и разницу между соседними снимками;
+- стеки всех потоков с заданной частотой (сэмплер) в формате collapsed
+  stacks для flamegraph.pl / speedscope.
+
+Отчёт пишется в отдельную папку при завершении, а в режиме --schedule
+ещё и по сигналу SIGUSR1 (kill -USR1 <pid>) без остановки процесса.
+"""
+
+import cProfile
+import io
+import linecache
+import os
+import pstats
+import signal
+import sys
+import threading
+import tracemalloc
+from collections import Counter, deque
+from contextlib import contextmanager
+from datetime import datetime
+
+from services.metrics import metrics
+
+
+class Profiler:
+    """CPU и память процесса. По умолчанию выключен - все вызовы ничего не делают."""
+
+    # Сколько строк выводить в топах
+    TOP = 25
+    # Сколько записей о разнице памяти между этапами хранить
+    STAGE_LOG_SIZE = 500
+
+    def __init__(self):
+        self.enabled = False
+        self.output_dir = ''
+        # RLock: отчёт по сигналу может прийти, пока главный поток держит блокировку
+        self._lock = threading.RLock()
+        self._profile = None
+        # Накопленный CPU профиль потоков обработки заданий (pstats.Stats)
+        self._thread_stats = None
+        self._stacks = Counter()
+        self._samples = 0
+        self._sampler = None
+        self._stop = threading.Event()
+        self._baseline = None
+        self._previous = None
+        self._stage_log = deque(maxlen=self.STAGE_LOG_SIZE)
+
+    def start(self, output_dir: str, sample_interval: float = 0.01, frames: int = 25):
+        """
+        Включить профилирование.
+
+        Args:
+            output_dir: Папка для отчётов
+            sample_interval: Интервал сэмплера стеков, секунды
+            frames: Глубина стека tracemalloc для каждой аллокации
+        """
+        self.output_dir = output_dir
+        self.enabled = True
+
+        tracemalloc.start(frames)
+        self._baseline = self._previous = self._take_snapshot()
+        metrics.on_span(self._on_span)
+
+        self._stop.clear()
+        self._sampler = threading.Thread(
+            target=self._sample, args=(sample_interval,), name='profiler-sampler', daemon=True
+        )
+        self._sampler.start()
+
+        self._profile = cProfile.Profile()
+        self._profile.enable()
+        print(f"[OK] Профилирование включено, отчёты: {output_dir}")
+
+    def install_signal(self):
+        """Дамп отчёта по SIGUSR1 (только Unix, вызывать из главного потока)."""
+        if not hasattr(signal, 'SIGUSR1'):
+            print("[!] SIGUSR1 не поддерживается в этой ОС, отчёт будет только при завершении")
+            return
+        signal.signal(signal.SIGUSR1, lambda signum, frame: self.dump('signal'))
+        print(f"[OK] Отчёт профилирования по сигналу: kill -USR1 {os.getpid()}")
+
+    def stop(self) -> str:
+        """Выключить профилирование и записать итоговый отчёт."""
+        if not self.enabled:
+            return ''
+        path = self.dump('final')
+        self._profile.disable()
+        self._stop.set()
+        self._sampler.join(timeout=1)
+        tracemalloc.stop()
+        self.enabled = False
+        return path
+
+    @contextmanager
+    def thread(self):
+        """CPU профиль текущего потока (cProfile видит только свой поток)."""
+        if not self.enabled or threading.current_thread() is threading.main_thread():
+            yield
+            return
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Python 3.12+: одновременно может работать только один cProfile,
+            # потоки остаются видны через сэмплер стеков
+            yield
+            return
+        try:
+            yield
+        finally:
+            profile.disable()
+            with self._lock:
+                if self._thread_stats is None:
+                    self._thread_stats = pstats.Stats(profile)
+                else:
+                    self._thread_stats.add(profile)
+
+    def checkpoint(self, label: str):
+        """Снимок памяти на границе этапа (разница с прошлым снимком - в отчёт)."""
+        if not self.enabled:
+            return
+        snapshot = self._take_snapshot()
+        with self._lock:
+            diff = snapshot.compare_to(self._previous, 'lineno')[:5]
+            self._previous = snapshot
+            current, peak = tracemalloc.get_traced_memory()
+            self._stage_log.append((
+                datetime.now().strftime('%H:%M:%S'), label, current, peak,
+                [str(stat) for stat in diff if stat.size_diff],
+            ))
+
+    def _on_span(self, stage: str, project: str, platform: str, seconds: float):
+        label = '/'.join(part for part in (stage, project, platform) if part)
+        self.checkpoint(f"{label} ({seconds:.2f} сек.)")
+
+    @staticmethod
+    def _take_snapshot():
+        return tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+            tracemalloc.Filter(False, cProfile.__file__),
+            tracemalloc.Filter(False, pstats.__file__),
+            tracemalloc.Filter(False, linecache.__file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+        ])
+
+    def _sample(self, interval: float):
+        """Сэмплер: стеки всех потоков каждые interval секунд."""
+        own = threading.get_ident()
+        while not self._stop.wait(interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)).replace(' ', '_'))
+                with self._lock:
+                    self._stacks[';'.join(reversed(stack))] += 1
+            with self._lock:
+                self._samples += 1
+
+    def dump(self, reason: str = 'manual') -> str:
+        """
+        Записать отчёт: cpu.prof и cpu.txt (cProfile), memory.txt
+        (топ аллокаций, рост с начала, разница по этапам), stacks.folded.
+
+        Returns:
+            Папка с отчётом
+        """
+        if not self.enabled:
+            return ''
+
+        path = os.path.join(self.output_dir, f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{reason}")
+        os.makedirs(path, exist_ok=True)
+        try:
+            self._dump_cpu(path)
+            self._dump_memory(path)
+            self._dump_stacks(path)
+            print(f"[OK] Отчёт профилирования: {path}")
+        except Exception as e:
+            print(f"[ОШИБКА] Не удалось записать отчёт профилирования: {e}")
+        return path
+
+    def _dump_cpu(self, path: str):
+        # create_stats выключает профайлер - включаем обратно после снимка
+        self._profile.create_stats()
+        stats = pstats.Stats(self._profile)
+        self._profile.enable()
+        with self._lock:
+            if self._thread_stats is not None:
+                stats.add(self._thread_stats)
+
+        stats.dump_stats(os.path.join(path, 'cpu.prof'))
+        out = io.StringIO()
+        stats.stream = out
+        stats.sort_stats('cumulative').print_stats(self.TOP)
+        stats.sort_stats('tottime').print_stats(self.TOP)
+        with open(os.path.join(path, 'cpu.txt'), 'w', encoding='utf-8') as f:
+            f.write(out.getvalue())
+
+    def _dump_memory(self, path: str):
+        snapshot = self._take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        lines = [
+            f"Память Python: сейчас {current / 1024 / 1024:.1f} МБ, пик {peak / 1024 / 1024:.1f} МБ",
+            "",
+            f"=== Топ-{self.TOP} мест выделения памяти ===",
+            *(str(stat) for stat in snapshot.statistics('lineno')[:self.TOP]),
+            "",
+            f"=== Рост с начала профилирования (топ-{self.TOP}) ===",
+            *(str(stat) for stat in snapshot.compare_to(self._baseline, 'lineno')[:self.TOP]),
+            "",
+            "=== Крупнейшие аллокации со стеком ===",
+        ]
+        for stat in snapshot.statistics('traceback')[:5]:
+            lines.append(f"{stat.count} блоков, {stat.size / 1024:.1f} КиБ")
+            lines.extend(f"    {line}" for line in stat.traceback.format())
+        lines += ["", "=== Разница памяти по этапам ==="]
+        with self._lock:
+            for moment, label, stage_current, stage_peak, diff in self._stage_log:
+                lines.append(f"{moment} {label}: {stage_current / 1024 / 1024:.1f} МБ "
+                             f"(пик {stage_peak / 1024 / 1024:.1f} МБ)")
+                lines.extend(f"    {line}" for line in diff)
+
+        with open(os.path.join(path, 'memory.txt'), 'w', encoding='utf-8') as f:
+            f.write("\n".join(lines) + "\n")
+
+    def _dump_stacks(self, path: str):
+        with self._lock:
+            stacks = sorted(self._stacks.items())
+            samples = self._samples
+        with open(os.path.join(path, 'stacks.folded'), 'w', encoding='utf-8') as f:
+            for stack, count in stacks:
+                f.write(f"{stack} {count}\n")
+        print(f"[OK] Стеки: {samples} замеров, {len(stacks)} уникальных "
+              f"(flamegraph.pl stacks.folded > flame.svg)")
+
+
+# Общий профайлер приложения
+profiler = Profiler()
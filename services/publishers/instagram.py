@@ -16,23 +16,74 @@ from selenium.webdriver.chrome.options import Options
 from webdriver_manager.chrome import ChromeDriverManager
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
-from config.settings import INSTAGRAM_USERNAME, INSTAGRAM_PASSWORD
+from config.settings import INSTAGRAM_USERNAME, INSTAGRAM_PASSWORD, INSTAGRAM_LEAN_BROWSER, INSTAGRAM_JS_HEAP_MB
+from services.metrics import metrics
+
+
+# Запросы, которые не нужны для входа и публикации (режим lean)
+BLOCKED_URL_PATTERNS = [
+    # Фото и видео ленты с CDN Instagram/Facebook
+    '*scontent*.cdninstagram.com*',
+    '*scontent*.fbcdn.net*',
+    '*.mp4*',
+    '*.m4s*',
+    '*.webm*',
+    # Шрифты
+    '*.woff*',
+    '*.ttf*',
+    '*.otf*',
+    # Аналитика и трекеры
+    '*google-analytics.com*',
+    '*googletagmanager.com*',
+    '*doubleclick.net*',
+    '*connect.facebook.net*',
+    '*graph.instagram.com/logging*',
+    '*/logging_client_events*',
+    '*/ajax/bz*',
+]
+
+# Фоновые службы Chrome, которые только тратят память и CPU
+LEAN_CHROME_ARGS = [
+    "--disable-background-networking",
+    "--disable-component-update",
+    "--disable-default-apps",
+    "--disable-extensions",
+    "--disable-sync",
+    "--disable-translate",
+    "--disable-client-side-phishing-detection",
+    "--disable-domain-reliability",
+    "--disable-breakpad",
+    "--disable-features=Translate,OptimizationHints,MediaRouter,AutofillServerCommunication,"
+    "InterestFeedContentSuggestions,CalculateNativeWinOcclusion",
+    "--metrics-recording-only",
+    "--mute-audio",
+    "--no-first-run",
+    "--no-default-browser-check",
+    "--renderer-process-limit=1",
+    "--disk-cache-size=33554432",
+]
 
 
 class InstagramPublisher:
     """Публикатор постов в Instagram через Selenium."""
 
-    def __init__(self, username: str = None, password: str = None, headless: bool = True):
+    # Максимум изображений в карусели
+    CAROUSEL_MAX = 10
+
+    def __init__(self, username: str = None, password: str = None, headless: bool = True,
+                 lean: bool = INSTAGRAM_LEAN_BROWSER):
         """
         Args:
             username: Логин Instagram. Если не указан, берётся из настроек.
             password: Пароль Instagram. Если не указан, берётся из настроек.
             headless: Запускать браузер без GUI (по умолчанию True).
+            lean: Облегчённый браузер: без медиа, шрифтов, трекеров и фоновых служб.
         """
         self.driver = None
         self.username = username or INSTAGRAM_USERNAME
         self.password = password or INSTAGRAM_PASSWORD
         self.headless = headless
+        self.lean = lean
         self.logged_in = False
 
     def connect(self) -> bool:
@@ -42,6 +93,10 @@ class InstagramPublisher:
                 print("[ОШИБКА] INSTAGRAM_USERNAME или INSTAGRAM_PASSWORD не заданы в .env")
                 return False
 
+            # Переподключение: старый браузер закрываем
+            if self.driver:
+                self.disconnect()
+
             # Настройка Chrome
             chrome_options = Options()
             if self.headless:
@@ -49,8 +104,15 @@ class InstagramPublisher:
             chrome_options.add_argument("--no-sandbox")
             chrome_options.add_argument("--disable-dev-shm-usage")
             chrome_options.add_argument("--disable-gpu")
-            chrome_options.add_argument("--window-size=1920,1080")
+            chrome_options.add_argument("--window-size=1280,900" if self.lean else "--window-size=1920,1080")
             chrome_options.add_argument("--disable-notifications")
+            if self.lean:
+                for argument in LEAN_CHROME_ARGS:
+                    chrome_options.add_argument(argument)
+                # Ограничение памяти JS в рендерере
+                chrome_options.add_argument(f"--js-flags=--max-old-space-size={INSTAGRAM_JS_HEAP_MB}")
+                # Не ждать загрузки всех картинок и скриптов - хватает DOMContentLoaded
+                chrome_options.page_load_strategy = 'eager'
             chrome_options.add_argument("--lang=ru-RU")
             # User agent для мобильной версии (проще для постинга)
             chrome_options.add_argument(
@@ -63,6 +125,11 @@ class InstagramPublisher:
             self.driver = webdriver.Chrome(service=service, options=chrome_options)
             self.driver.implicitly_wait(10)
 
+            if self.lean:
+                # Блокируем ненужные запросы через CDP
+                self.driver.execute_cdp_cmd('Network.enable', {})
+                self.driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': BLOCKED_URL_PATTERNS})
+
             print("[OK] Браузер запущен, выполняю вход в Instagram...")
 
             # Логин
@@ -71,6 +138,7 @@ class InstagramPublisher:
 
             self.logged_in = True
             print("[OK] Instagram: успешный вход")
+            self.report_memory()
             return True
 
         except Exception as e:
@@ -191,13 +259,14 @@ class InstagramPublisher:
         except:
             pass
 
-    def publish(self, text: str, image_path: str) -> dict:
+    def publish(self, text: str, image_path: str, image_paths: list = None) -> dict:
         """
         Публикация поста в Instagram.
 
         Args:
             text: Текст (подпись) поста
             image_path: Путь к изображению (ОБЯЗАТЕЛЬНО для Instagram)
+            image_paths: Изображения карусели (опционально, вместо image_path)
 
         Returns:
             {'success': bool, 'post_id': str, 'error': str}
@@ -205,7 +274,8 @@ class InstagramPublisher:
         if not self.logged_in or not self.driver:
             return {'success': False, 'post_id': '', 'error': 'Не выполнен вход в Instagram'}
 
-        if not image_path or not os.path.exists(image_path):
+        image_paths = [p for p in (image_paths or [image_path]) if p and os.path.exists(p)]
+        if not image_paths:
             return {'success': False, 'post_id': '', 'error': 'Instagram требует изображение для поста'}
 
         try:
@@ -226,8 +296,9 @@ class InstagramPublisher:
             file_input = WebDriverWait(self.driver, 10).until(
                 EC.presence_of_element_located((By.XPATH, "//input[@type='file']"))
             )
-            file_input.send_keys(os.path.abspath(image_path))
-            time.sleep(3)
+            # Несколько файлов сразу (через перевод строки) - карусель
+            file_input.send_keys("\n".join(os.path.abspath(p) for p in image_paths[:self.CAROUSEL_MAX]))
+            time.sleep(3 + len(image_paths) // 2)
 
             # Нажать "Далее" (Next) - может быть несколько раз
             self._click_next_button()
@@ -256,6 +327,7 @@ class InstagramPublisher:
             post_id = f"ig_{int(time.time())}"
 
             print(f"[OK] Опубликовано в Instagram, ID: {post_id}")
+            self.report_memory()
             return {'success': True, 'post_id': post_id, 'error': ''}
 
         except Exception as e:
@@ -340,6 +412,47 @@ class InstagramPublisher:
                 continue
         return False
 
+    def health_check(self) -> bool:
+        """Проверка, что вход выполнен и браузер отвечает."""
+        if not self.logged_in or not self.driver:
+            return False
+        try:
+            return 'instagram.com' in self.driver.current_url
+        except Exception as e:
+            print(f"[ОШИБКА] Instagram: браузер не отвечает: {e}")
+            return False
+
+    def browser_memory(self) -> tuple[int, int]:
+        """
+        Память браузера: суммарный RSS chromedriver и всех процессов Chrome.
+
+        Returns:
+            (RSS в байтах, количество процессов); (0, 0), если узнать не удалось
+        """
+        try:
+            root = self.driver.service.process.pid
+        except AttributeError:
+            return 0, 0
+
+        try:
+            import psutil
+            process = psutil.Process(root)
+            tree = [process] + process.children(recursive=True)
+            return sum(p.memory_info().rss for p in tree), len(tree)
+        except ImportError:
+            return _proc_tree_rss(root)
+        except Exception:
+            return 0, 0
+
+    def report_memory(self):
+        """Вывести и записать в метрики память браузера."""
+        rss, count = self.browser_memory()
+        if not rss:
+            return
+        metrics.gauge('browser_rss_bytes', rss, browser='instagram')
+        metrics.gauge('browser_processes', count, browser='instagram')
+        print(f"[OK] Instagram: браузер занимает {rss / 1024 / 1024:.0f} МБ ({count} процессов)")
+
     def disconnect(self):
         """Закрыть браузер."""
         if self.driver:
@@ -349,6 +462,40 @@ class InstagramPublisher:
             print("[OK] Instagram: браузер закрыт")
 
 
+def _proc_tree_rss(root: int) -> tuple[int, int]:
+    """RSS дерева процессов через /proc (Linux, без psutil)."""
+    if not os.path.isdir('/proc'):
+        return 0, 0
+
+    children = {}
+    rss = {}
+    page_size = os.sysconf('SC_PAGE_SIZE')
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                # Имя процесса в скобках может содержать пробелы
+                fields = f.read().rsplit(')', 1)[1].split()
+            with open(f'/proc/{entry}/statm') as f:
+                resident = int(f.read().split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        pid = int(entry)
+        children.setdefault(int(fields[1]), []).append(pid)
+        rss[pid] = resident * page_size
+
+    total, count, stack = 0, 0, [root]
+    while stack:
+        pid = stack.pop()
+        if pid not in rss:
+            continue
+        total += rss[pid]
+        count += 1
+        stack.extend(children.get(pid, []))
+    return total, count
+
+
 # Для тестирования модуля напрямую
 if __name__ == "__main__":
     publisher = InstagramPublisher(headless=False)  # headless=False для отладки
@@ -6,16 +6,22 @@
 import asyncio
 import os
 import sys
-from telegram import Bot
+from contextlib import ExitStack
+from telegram import Bot, InputMediaPhoto
 from telegram.constants import ParseMode
+from telegram.error import BadRequest
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 from config.settings import TELEGRAM_BOT_TOKEN, TELEGRAM_CHANNEL_ID
+from services.publishers.telegram_html import compose_post, strip_tags
 
 
 class TelegramPublisher:
     """Публикатор постов в Telegram."""
 
+    # Максимум фото в одном альбоме
+    ALBUM_MAX = 10
+
     def __init__(self, channel_id: str = None):
         """
         Args:
@@ -38,33 +44,106 @@ class TelegramPublisher:
             print(f"[ОШИБКА] Не удалось инициализировать бота: {e}")
             return False
 
+    def health_check(self) -> bool:
+        """Проверка токена: запрос get_me."""
+        try:
+            me = asyncio.run(self.bot.get_me())
+            print(f"[OK] Telegram: бот @{me.username}")
+            return True
+        except Exception as e:
+            print(f"[ОШИБКА] Telegram не отвечает: {e}")
+            return False
+
     async def _send_photo_async(self, image_path: str, caption: str) -> str:
         """Асинхронная отправка фото с подписью."""
-        with open(image_path, 'rb') as photo:
-            message = await self.bot.send_photo(
-                chat_id=self.channel_id,
-                photo=photo,
-                caption=caption,
-                parse_mode=ParseMode.HTML,
-            )
+        try:
+            with open(image_path, 'rb') as photo:
+                message = await self.bot.send_photo(
+                    chat_id=self.channel_id,
+                    photo=photo,
+                    caption=caption or None,
+                    parse_mode=ParseMode.HTML if caption else None,
+                )
+        except BadRequest as e:
+            if not _is_parse_error(e):
+                raise
+            # Разметку не удалось разобрать - отправляем без неё
+            print(f"[!] Telegram не принял разметку подписи, отправляю без HTML: {e}")
+            with open(image_path, 'rb') as photo:
+                message = await self.bot.send_photo(
+                    chat_id=self.channel_id,
+                    photo=photo,
+                    caption=strip_tags(caption),
+                )
         return str(message.message_id)
 
+    async def _send_album_async(self, image_paths: list, caption: str) -> str:
+        """Асинхронная отправка альбома одним sendMediaGroup (подпись - у первого фото)."""
+        async def send(caption: str, parse_mode):
+            with ExitStack() as stack:
+                media = [
+                    InputMediaPhoto(
+                        stack.enter_context(open(path, 'rb')),
+                        caption=caption if idx == 0 else None,
+                        parse_mode=parse_mode if idx == 0 else None,
+                    )
+                    for idx, path in enumerate(image_paths[:self.ALBUM_MAX])
+                ]
+                messages = await self.bot.send_media_group(chat_id=self.channel_id, media=media)
+            return str(messages[0].message_id)
+
+        try:
+            return await send(caption or None, ParseMode.HTML if caption else None)
+        except BadRequest as e:
+            if not _is_parse_error(e):
+                raise
+            print(f"[!] Telegram не принял разметку подписи альбома, отправляю без HTML: {e}")
+            return await send(strip_tags(caption), None)
+
     async def _send_text_async(self, text: str) -> str:
         """Асинхронная отправка текстового сообщения."""
-        message = await self.bot.send_message(
-            chat_id=self.channel_id,
-            text=text,
-            parse_mode=ParseMode.HTML,
-        )
+        try:
+            message = await self.bot.send_message(
+                chat_id=self.channel_id,
+                text=text,
+                parse_mode=ParseMode.HTML,
+            )
+        except BadRequest as e:
+            if not _is_parse_error(e):
+                raise
+            print(f"[!] Telegram не принял разметку сообщения, отправляю без HTML: {e}")
+            message = await self.bot.send_message(
+                chat_id=self.channel_id,
+                text=strip_tags(text),
+            )
         return str(message.message_id)
 
-    def publish(self, text: str, image_path: str = None) -> dict:
+    async def _send_plan_async(self, plan: list, image_paths: list = None) -> str:
+        """Отправка поста по раскладке из compose_post. Возвращает ID первого сообщения."""
+        post_id = ''
+        for kind, body in plan:
+            if kind == 'photo' and len(image_paths) > 1:
+                message_id = await self._send_album_async(image_paths, body)
+            elif kind == 'photo':
+                message_id = await self._send_photo_async(image_paths[0], body)
+            else:
+                message_id = await self._send_text_async(body)
+            post_id = post_id or message_id
+        return post_id
+
+    def publish(self, text: str, image_path: str = None, image_paths: list = None) -> dict:
         """
         Публикация поста в Telegram.
 
+        Текст очищается до HTML-подмножества Telegram и раскладывается
+        по подписи к фото (1024) и сообщениям (4096) так, чтобы
+        запросов к API было как можно меньше. Несколько изображений
+        отправляются альбомом, подпись - у первого фото.
+
         Args:
             text: Текст поста
             image_path: Путь к изображению (опционально)
+            image_paths: Изображения альбома (опционально, вместо image_path)
 
         Returns:
             {'success': bool, 'post_id': str, 'error': str}
@@ -72,23 +151,15 @@ class TelegramPublisher:
         if not self.bot:
             return {'success': False, 'post_id': '', 'error': 'Бот не инициализирован'}
 
+        image_paths = [p for p in (image_paths or [image_path]) if p and os.path.exists(p)]
+        plan = compose_post(text, bool(image_paths))
+        if not plan:
+            return {'success': False, 'post_id': '', 'error': 'Пустой текст поста'}
+
         try:
-            # Telegram ограничение: подпись к фото - 1024 символа
-            if image_path and os.path.exists(image_path):
-                # Если текст слишком длинный для подписи
-                if len(text) > 1024:
-                    # Отправляем фото с коротким текстом
-                    short_caption = text[:1000] + "..."
-                    post_id = asyncio.run(self._send_photo_async(image_path, short_caption))
-
-                    # Затем отправляем полный текст отдельным сообщением
-                    asyncio.run(self._send_text_async(text))
-                else:
-                    post_id = asyncio.run(self._send_photo_async(image_path, text))
-            else:
-                post_id = asyncio.run(self._send_text_async(text))
+            post_id = asyncio.run(self._send_plan_async(plan, image_paths))
 
-            print(f"[OK] Опубликовано в Telegram, ID: {post_id}")
+            print(f"[OK] Опубликовано в Telegram, ID: {post_id} (запросов: {len(plan)})")
             return {'success': True, 'post_id': post_id, 'error': ''}
 
         except Exception as e:
@@ -102,6 +173,11 @@ class TelegramPublisher:
         print(f"[OK] Канал изменён на: {channel_id}")
 
 
+def _is_parse_error(error: Exception) -> bool:
+    """Ошибка Telegram из-за некорректной HTML-разметки."""
+    return "parse entities" in str(error).lower()
+
+
 # Для тестирования модуля напрямую
 if __name__ == "__main__":
     publisher = TelegramPublisher()
@@ -0,0 +1,323 @@
+"""
+Подготовка текста поста для Telegram (parse_mode=HTML).
+
+Приводит ответ GPT к подмножеству HTML, которое понимает Telegram,
+режет длинный текст по границам абзацев, не ломая теги и сущности,
+и выбирает раскладку поста с минимальным числом запросов к API.
+"""
+
+import html
+import re
+from html.parser import HTMLParser
+
+
+# Лимиты Telegram (в UTF-16 единицах, после разбора разметки)
+CAPTION_LIMIT = 1024
+MESSAGE_LIMIT = 4096
+
+# Теги, которые поддерживает Telegram, и их синонимы
+ALLOWED_TAGS = {'b', 'i', 'u', 's', 'a', 'code', 'pre', 'tg-spoiler', 'blockquote'}
+TAG_ALIASES = {
+    'strong': 'b',
+    'em': 'i',
+    'ins': 'u',
+    'strike': 's',
+    'del': 's',
+}
+VOID_TAGS = {'br', 'hr', 'img', 'input', 'meta', 'link', 'wbr'}
+BLOCK_TAGS = {'p', 'div', 'ul', 'ol', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6'}
+LINK_SCHEMES = ('http://', 'https://', 'tg://', 'mailto:')
+
+# Разметка Markdown, которую GPT вставляет вместо HTML
+_MD_HEADING = re.compile(r'^#{1,6}[ \t]+(.+?)[ \t]*#*[ \t]*$', re.MULTILINE)
+_MD_BOLD = re.compile(r'\*\*(?=\S)(.+?)(?<=\S)\*\*|__(?=\S)(.+?)(?<=\S)__')
+_MD_LINK = re.compile(r'\[([^\]\n]+)\]\(((?:https?|tg)://[^)\s]+)\)')
+
+# Разбор готового HTML на атомы: тег, сущность или один символ
+_UNIT_RE = re.compile(r'(<[^>]+>)|(&#?\w+;)|(.)', re.DOTALL)
+
+SENTENCE_END = '.!?…'
+
+# Разрез не раньше этой доли лимита, иначе куски получаются слишком мелкими
+MIN_FILL = 0.3
+
+
+class _Sanitizer(HTMLParser):
+    """Оставляет только поддерживаемые Telegram теги и экранирует текст."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.out = []
+        # (исходный тег, тег Telegram или None если тег отброшен)
+        self.stack = []
+
+    def _in_code(self) -> bool:
+        return any(kept in ('code', 'pre') for _, kept in self.stack)
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+
+        if tag == 'br':
+            self.out.append('\n')
+            return
+        if tag in VOID_TAGS:
+            return
+        if tag in BLOCK_TAGS:
+            self.out.append('\n\n')
+            self.stack.append((tag, None))
+            if tag.startswith('h'):
+                self.out.append('<b>')
+                self.stack.append(('', 'b'))
+            return
+        if tag == 'li':
+            self.out.append('\n• ')
+            self.stack.append((tag, None))
+            return
+
+        kept = TAG_ALIASES.get(tag, tag)
+        if tag == 'span':
+            kept = 'tg-spoiler' if attrs.get('class') == 'tg-spoiler' else None
+        if kept not in ALLOWED_TAGS:
+            kept = None
+
+        # Внутри code/pre Telegram не допускает вложенной разметки
+        # (исключение - <pre><code class="language-...">)
+        inside_pre = bool(self.stack) and self.stack[-1][1] == 'pre'
+        if kept and self._in_code() and not (kept == 'code' and inside_pre):
+            kept = None
+
+        if kept == 'a':
+            href = (attrs.get('href') or '').strip()
+            if not href.startswith(LINK_SCHEMES) or any(k == 'a' for _, k in self.stack):
+                kept = None
+            else:
+                self.out.append(f'<a href="{html.escape(href, quote=True)}">')
+        elif kept == 'code' and inside_pre and (attrs.get('class') or '').startswith('language-'):
+            self.out.append(f'<code class="{html.escape(attrs["class"], quote=True)}">')
+        elif kept == 'blockquote' and 'expandable' in attrs:
+            self.out.append('<blockquote expandable>')
+        elif kept:
+            self.out.append(f'<{kept}>')
+
+        self.stack.append((tag, kept))
+
+    def handle_startendtag(self, tag, attrs):
+        if tag == 'br':
+            self.out.append('\n')
+
+    def handle_endtag(self, tag):
+        # Лишний закрывающий тег просто пропускаем
+        if not any(source == tag for source, _ in self.stack):
+            return
+        # Закрываем всё, что открыто внутри, чтобы разметка осталась корректной
+        while self.stack:
+            source, kept = self.stack.pop()
+            if kept:
+                self.out.append(f'</{kept}>')
+            if source == tag:
+                break
+        if tag in BLOCK_TAGS:
+            self.out.append('\n\n')
+
+    def handle_data(self, data):
+        self.out.append(html.escape(data, quote=False))
+
+    def result(self) -> str:
+        self.close()
+        while self.stack:
+            _, kept = self.stack.pop()
+            if kept:
+                self.out.append(f'</{kept}>')
+        return ''.join(self.out)
+
+
+def markdown_to_html(text: str) -> str:
+    """Перевести типичную Markdown-разметку GPT (**жирный**, # заголовок, [ссылка](url)) в HTML."""
+    text = _MD_HEADING.sub(r'<b>\1</b>', text)
+    text = _MD_BOLD.sub(lambda m: f'<b>{m.group(1) or m.group(2)}</b>', text)
+    text = _MD_LINK.sub(r'<a href="\2">\1</a>', text)
+    return text
+
+
+def sanitize(text: str) -> str:
+    """
+    Привести текст к HTML-подмножеству Telegram.
+
+    Неподдерживаемые теги удаляются (текст внутри остаётся), незакрытые
+    теги закрываются, лишние закрывающие отбрасываются, спецсимволы
+    экранируются.
+    """
+    parser = _Sanitizer()
+    parser.feed(markdown_to_html(text or ''))
+    result = parser.result()
+
+    # Нормализуем пробелы: не больше одной пустой строки подряд
+    result = re.sub(r'[ \t]+\n', '\n', result)
+    result = re.sub(r'\n{3,}', '\n\n', result)
+    return result.strip()
+
+
+def visible_length(text: str) -> int:
+    """Длина текста так, как её считает Telegram: без тегов, в UTF-16."""
+    return sum(unit[2] for unit in _tokenize(text))
+
+
+def strip_tags(text: str) -> str:
+    """Текст без разметки (для повторной отправки без parse_mode)."""
+    return html.unescape(re.sub(r'<[^>]+>', '', text))
+
+
+def _utf16_len(char: str) -> int:
+    return len(char.encode('utf-16-le')) // 2
+
+
+def _tokenize(text: str) -> list:
+    """Разбить HTML на атомы: (raw, char или None для тега, видимая длина)."""
+    units = []
+    for match in _UNIT_RE.finditer(text):
+        tag, entity, char = match.groups()
+        if tag:
+            units.append((tag, None, 0))
+        elif entity:
+            units.append((entity, html.unescape(entity), 1))
+        else:
+            units.append((char, char, _utf16_len(char)))
+    return units
+
+
+def _tag_name(raw: str) -> str:
+    return raw.strip('</>').split()[0].lower()
+
+
+def split(text: str, first_limit: int, rest_limit: int = None) -> list[str]:
+    """
+    Разрезать готовый HTML на куски не длиннее лимита.
+
+    Режет по абзацу, затем по строке, концу предложения и пробелу.
+    Теги, открытые на месте разреза, закрываются в конце куска
+    и открываются заново в начале следующего. Сущности (&amp;) не режутся.
+
+    Args:
+        text: Текст после sanitize()
+        first_limit: Лимит первого куска (подпись к фото или сообщение)
+        rest_limit: Лимит остальных кусков (по умолчанию как первый)
+    """
+    rest_limit = rest_limit or first_limit
+    units = _tokenize(text)
+    count = len(units)
+
+    # Для каждой позиции: открытые теги и накопленная видимая длина
+    stacks = [()]
+    cum = [0]
+    stack = []
+    for raw, char, length in units:
+        if char is None:
+            if raw.startswith('</'):
+                name = _tag_name(raw)
+                for idx in range(len(stack) - 1, -1, -1):
+                    if _tag_name(stack[idx]) == name:
+                        del stack[idx:]
+                        break
+            else:
+                stack.append(raw)
+        stacks.append(tuple(stack))
+        cum.append(cum[-1] + length)
+
+    def is_space(idx):
+        return idx < count and units[idx][1] is not None and units[idx][1].isspace()
+
+    chunks = []
+    start = 0
+    while start < count:
+        limit = first_limit if not chunks else rest_limit
+
+        # Самая дальняя позиция, до которой кусок влезает в лимит
+        end = start
+        while end < count and cum[end + 1] - cum[start] <= limit:
+            end += 1
+
+        if end == start:
+            end = start + 1
+        elif end < count:
+            end = _find_break(units, start, end, limit, cum) or end
+
+        # Убираем пробелы в конце куска
+        cut = end
+        while cut > start and is_space(cut - 1):
+            cut -= 1
+
+        body = ''.join(raw for raw, _, _ in units[start:cut])
+        opening = ''.join(stacks[start])
+        closing = ''.join(f'</{_tag_name(raw)}>' for raw in reversed(stacks[cut]))
+        if strip_tags(body).strip():
+            chunks.append(opening + body + closing)
+
+        # Пробелы в начале следующего куска не нужны
+        start = end
+        while is_space(start):
+            start += 1
+
+    return chunks
+
+
+def _find_break(units: list, start: int, end: int, limit: int, cum: list) -> int:
+    """Лучшее место разреза в units[start:end]: абзац > строка > предложение > слово."""
+    min_pos = cum[start] + limit * MIN_FILL
+    best = {}
+    for idx in range(end, start, -1):
+        char = units[idx][1] if idx < len(units) else None
+        if char is None or not char.isspace() or cum[idx] < min_pos:
+            continue
+        prev = units[idx - 1][1] or ''
+        if char == '\n' and prev == '\n':
+            level = 3
+        elif char == '\n':
+            level = 2
+        elif prev and prev in SENTENCE_END:
+            level = 1
+        else:
+            level = 0
+        best.setdefault(level, idx)
+        if level == 3:
+            break
+    for level in (3, 2, 1, 0):
+        if level in best:
+            return best[level]
+    return 0
+
+
+def compose_post(text: str, with_photo: bool) -> list[tuple[str, str]]:
+    """
+    Раскладка поста по запросам к Telegram.
+
+    Варианты с фото:
+      - всё влезает в подпись: одно фото с подписью;
+      - начало текста в подписи, остаток отдельными сообщениями;
+      - фото без подписи, затем текст сообщениями по 4096.
+    Выбирается вариант с наименьшим числом запросов; при равенстве -
+    тот, где текст порезан на меньшее число частей.
+
+    Returns:
+        [('photo', подпись), ('message', текст), ...] или [] для пустого текста
+    """
+    body = sanitize(text)
+    if not strip_tags(body).strip():
+        return [('photo', '')] if with_photo else []
+
+    if not with_photo:
+        return [('message', chunk) for chunk in split(body, MESSAGE_LIMIT)]
+
+    if visible_length(body) <= CAPTION_LIMIT:
+        return [('photo', body)]
+
+    with_caption = split(body, CAPTION_LIMIT, MESSAGE_LIMIT)
+    separate = split(body, MESSAGE_LIMIT)
+
+    caption_plan = [('photo', with_caption[0])] + [('message', c) for c in with_caption[1:]]
+    separate_plan = [('photo', '')] + [('message', c) for c in separate]
+
+    if len(separate_plan) < len(caption_plan):
+        return separate_plan
+    if len(separate_plan) == len(caption_plan) and len(separate) < len(with_caption):
+        return separate_plan
+    return caption_plan
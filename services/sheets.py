@@ -3,14 +3,16 @@
 Читает задания на постинг и обновляет статусы.
 """
 
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
-from typing import Optional
+from typing import Callable, Optional
 import sys
 import os
+import time
+import zlib
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from config.settings import GOOGLE_SHEETS_ID, GOOGLE_CREDENTIALS_FILE
+from config.settings import GOOGLE_SHEETS_ID, GOOGLE_CREDENTIALS_FILE, SHEETS_POOL_SIZE, SHEETS_TIMEOUT
+from services.metrics import metrics
+from services.sheets_transport import SheetsTransport
 
 
 class SheetsService:
@@ -26,58 +28,85 @@ class SheetsService:
         'datetime': 3,     # D - Дата и время публикации
         'status': 4,       # E - Статус (pending, done, error)
         'post_id': 5,      # F - ID поста после публикации
+        'image': 6,        # G - Картинка: dalle или card (необязательно)
+        'priority': 7,     # H - Приоритет: high, normal, low (необязательно)
+        'platform_status': 8,  # I - Статусы по платформам: tg=done:123;ig=error
     }
 
     def __init__(self):
-        self.service = None
+        self.transport = None
         self.sheet_id = GOOGLE_SHEETS_ID
 
     def connect(self) -> bool:
         """Подключение к Google Sheets API."""
         try:
-            credentials = service_account.Credentials.from_service_account_file(
+            self.transport = SheetsTransport(
                 GOOGLE_CREDENTIALS_FILE,
-                scopes=self.SCOPES
+                scopes=self.SCOPES,
+                pool_size=SHEETS_POOL_SIZE,
+                timeout=SHEETS_TIMEOUT,
             )
-            self.service = build('sheets', 'v4', credentials=credentials)
             print("[OK] Подключено к Google Sheets")
             return True
         except Exception as e:
             print(f"[ОШИБКА] Не удалось подключиться к Google Sheets: {e}")
             return False
 
+    def health_check(self) -> bool:
+        """Проверка доступа: лёгкий запрос метаданных таблицы."""
+        try:
+            self.transport.execute(lambda service: service.spreadsheets().get(
+                spreadsheetId=self.sheet_id,
+                fields='spreadsheetId'
+            ))
+            return True
+        except Exception as e:
+            print(f"[ОШИБКА] Google Sheets: таблица недоступна: {e}")
+            return False
+
+    def _read_rows(self) -> list:
+        """Прочитать все строки листа (A2:I - пропускаем заголовок)."""
+        with metrics.span('sheets_read'):
+            result = self.transport.execute(lambda service: service.spreadsheets().values().get(
+                spreadsheetId=self.sheet_id,
+                range='A2:I'
+            ))
+        return result.get('values', [])
+
+    def _parse_row(self, idx: int, row: list) -> Optional[dict]:
+        """Строка таблицы -> задание (None для пустых строк)."""
+        # Пропускаем пустые строки
+        if len(row) < 5:
+            return None
+
+        return {
+            'row_number': idx + 2,  # +2 потому что начинаем с A2
+            'project': row[self.COLUMNS['project']],
+            'topic': row[self.COLUMNS['topic']],
+            'platforms': row[self.COLUMNS['platforms']].split(','),
+            'datetime': row[self.COLUMNS['datetime']],
+            'status': row[self.COLUMNS['status']],
+            'image': row[self.COLUMNS['image']] if len(row) > self.COLUMNS['image'] else '',
+            'priority': (row[self.COLUMNS['priority']] if len(row) > self.COLUMNS['priority'] else '').strip().lower() or 'normal',
+            'platform_status': self.parse_platform_status(
+                row[self.COLUMNS['platform_status']] if len(row) > self.COLUMNS['platform_status'] else ''
+            ),
+        }
+
     def get_pending_tasks(self) -> list[dict]:
         """Получить все задания со статусом 'pending'."""
-        if not self.service:
+        if not self.transport:
             print("[ОШИБКА] Сначала вызовите connect()")
             return []
 
         try:
-            # Читаем данные из листа (A2:F - пропускаем заголовок)
-            result = self.service.spreadsheets().values().get(
-                spreadsheetId=self.sheet_id,
-                range='A2:F'
-            ).execute()
-
-            rows = result.get('values', [])
+            rows = self._read_rows()
             tasks = []
 
             for idx, row in enumerate(rows):
-                # Пропускаем пустые строки
-                if len(row) < 5:
-                    continue
-
-                status = row[self.COLUMNS['status']] if len(row) > self.COLUMNS['status'] else ''
-
-                if status.lower() == 'pending':
-                    tasks.append({
-                        'row_number': idx + 2,  # +2 потому что начинаем с A2
-                        'project': row[self.COLUMNS['project']],
-                        'topic': row[self.COLUMNS['topic']],
-                        'platforms': row[self.COLUMNS['platforms']].split(','),
-                        'datetime': row[self.COLUMNS['datetime']],
-                        'status': status,
-                    })
+                task = self._parse_row(idx, row)
+                if task and task['status'].lower() == 'pending':
+                    tasks.append(task)
 
             print(f"[OK] Найдено {len(tasks)} заданий для публикации")
             return tasks
@@ -86,28 +115,269 @@ class SheetsService:
             print(f"[ОШИБКА] Не удалось прочитать данные: {e}")
             return []
 
+    # --- Аренда строк (несколько воркеров на одну таблицу) ---
+    #
+    # Воркер помечает строку статусом processing:<воркер>:<срок> и считается
+    # её владельцем до истечения срока. Просроченную аренду может забрать
+    # другой воркер. В Sheets нет атомарной операции compare-and-set, поэтому
+    # статус перечитывается перед записью и проверяется после неё: если две
+    # записи всё же пересеклись, строку получит тот, чья запись осталась.
+
+    LEASE_PREFIX = 'processing'
+
+    # Пауза между записью аренды и проверкой (даём конкурентам дописать)
+    LEASE_SETTLE_SECONDS = 1.0
+
+    @staticmethod
+    def make_lease(worker_id: str, lease_seconds: int) -> str:
+        """Значение статуса для аренды строки."""
+        worker_id = worker_id.replace(':', '-')
+        return f"{SheetsService.LEASE_PREFIX}:{worker_id}:{int(time.time() + lease_seconds)}"
+
+    @staticmethod
+    def parse_lease(status: str) -> Optional[tuple[str, int]]:
+        """processing:<воркер>:<срок> -> (воркер, срок) или None."""
+        parts = status.split(':')
+        if len(parts) != 3 or parts[0] != SheetsService.LEASE_PREFIX:
+            return None
+        try:
+            return parts[1], int(parts[2])
+        except ValueError:
+            return None
+
+    def _is_claimable(self, status: str) -> bool:
+        """Строку можно забрать: pending или просроченная аренда."""
+        if status.lower() == 'pending':
+            return True
+        lease = self.parse_lease(status)
+        return bool(lease) and lease[1] < time.time()
+
+    @staticmethod
+    def in_shard(project: str, projects: list = None, shard: str = '') -> bool:
+        """
+        Относится ли проект к воркеру.
+
+        Args:
+            projects: Список проектов воркера (пусто - все)
+            shard: Шард вида "i/n" - проект попадает в шард по crc32 имени
+        """
+        if projects and project not in projects:
+            return False
+        if shard:
+            index, total = (int(x) for x in shard.split('/'))
+            return zlib.crc32(project.encode('utf-8')) % total == index
+        return True
+
+    def _read_statuses(self, row_numbers: list[int]) -> list[str]:
+        """Текущие значения колонки статуса для указанных строк."""
+        result = self.transport.execute(lambda service: service.spreadsheets().values().batchGet(
+            spreadsheetId=self.sheet_id,
+            ranges=[f'E{row}' for row in row_numbers],
+        ))
+        statuses = []
+        for value_range in result.get('valueRanges', []):
+            values = value_range.get('values', [])
+            statuses.append(values[0][0] if values and values[0] else '')
+        return statuses
+
+    def _write_statuses(self, updates: dict):
+        """Записать статусы {row_number: status} одним запросом."""
+        self.transport.execute(lambda service: service.spreadsheets().values().batchUpdate(
+            spreadsheetId=self.sheet_id,
+            body={
+                'valueInputOption': 'RAW',
+                'data': [
+                    {'range': f'E{row}', 'values': [[status]]}
+                    for row, status in updates.items()
+                ],
+            },
+        ))
+
+    def claim_tasks(self, worker_id: str, limit: int, lease_seconds: int,
+                    projects: list = None, shard: str = '', exclude: set = None,
+                    select: Callable[[list, int], list] = None) -> list[dict]:
+        """
+        Забрать в работу до limit заданий.
+
+        Берутся строки pending и строки с просроченной арендой.
+        У каждого возвращённого задания есть ключ 'lease' - текущее
+        значение статуса-аренды.
+
+        Args:
+            worker_id: Имя воркера
+            limit: Максимум строк за раз
+            lease_seconds: Срок аренды
+            projects: Проекты воркера (пусто - все)
+            shard: Шард проектов "i/n"
+            exclude: Номера строк, которые этот воркер уже обработал в текущем запуске
+            select: Выбор limit строк из всех доступных (по умолчанию - первые по порядку)
+        """
+        if not self.transport:
+            print("[ОШИБКА] Сначала вызовите connect()")
+            return []
+
+        exclude = exclude or set()
+
+        try:
+            candidates = []
+            for idx, row in enumerate(self._read_rows()):
+                task = self._parse_row(idx, row)
+                if not task or task['row_number'] in exclude:
+                    continue
+                if not self._is_claimable(task['status']):
+                    continue
+                if not self.in_shard(task['project'], projects, shard):
+                    continue
+                candidates.append(task)
+                if not select and len(candidates) >= limit:
+                    break
+
+            if select:
+                candidates = select(candidates, limit)
+            if not candidates:
+                return []
+
+            # Сравнение перед записью: статус не должен был измениться
+            current = self._read_statuses([t['row_number'] for t in candidates])
+            candidates = [t for t, status in zip(candidates, current) if status == t['status']]
+            if not candidates:
+                return []
+
+            lease = self.make_lease(worker_id, lease_seconds)
+            self._write_statuses({t['row_number']: lease for t in candidates})
+
+            # Проверка после записи: строка наша, только если осталась наша аренда
+            time.sleep(self.LEASE_SETTLE_SECONDS)
+            current = self._read_statuses([t['row_number'] for t in candidates])
+
+            claimed = []
+            for task, status in zip(candidates, current):
+                if status == lease:
+                    task['status'] = lease
+                    task['lease'] = lease
+                    claimed.append(task)
+
+            lost = len(candidates) - len(claimed)
+            print(f"[OK] Взято в работу {len(claimed)} заданий"
+                  + (f" ({lost} забрал другой воркер)" if lost else ""))
+            return claimed
+
+        except Exception as e:
+            print(f"[ОШИБКА] Не удалось взять задания в работу: {e}")
+            return []
+
+    def renew_lease(self, task: dict, worker_id: str, lease_seconds: int, force: bool = False) -> bool:
+        """
+        Продлить аренду строки.
+
+        Возвращает False, если аренду перехватил другой воркер - в этом
+        случае задание публиковать нельзя. Задания без аренды (одиночный
+        режим или статус уже записан) считаются своими.
+        """
+        lease = task.get('lease')
+        if not lease or not self.transport:
+            return True
+
+        try:
+            current = self._read_statuses([task['row_number']])[0]
+            if current != lease:
+                print(f"[!] Строка {task['row_number']}: аренда потеряна ({current})")
+                return False
+
+            expires = self.parse_lease(lease)[1]
+            if not force and expires - time.time() > lease_seconds / 2:
+                return True
+
+            new_lease = self.make_lease(worker_id, lease_seconds)
+            self._write_statuses({task['row_number']: new_lease})
+            task['lease'] = task['status'] = new_lease
+            return True
+
+        except Exception as e:
+            print(f"[ОШИБКА] Не удалось продлить аренду: {e}")
+            return False
+
+    def release_lease(self, task: dict, status: str = 'pending') -> bool:
+        """Вернуть строку в очередь, если она всё ещё в нашей аренде."""
+        lease = task.get('lease')
+        if not lease or not self.transport:
+            return False
+
+        try:
+            if self._read_statuses([task['row_number']])[0] != lease:
+                return False
+            self._write_statuses({task['row_number']: status})
+            task['lease'] = None
+            task['status'] = status
+            return True
+        except Exception as e:
+            print(f"[ОШИБКА] Не удалось вернуть строку в очередь: {e}")
+            return False
+
+    # --- Статусы по платформам (колонка I) ---
+
+    @staticmethod
+    def parse_platform_status(value: str) -> dict:
+        """"tg=done:123;ig=error" -> {'tg': {'status': 'done', 'post_id': '123'}, 'ig': {...}}."""
+        result = {}
+        for item in (value or '').split(';'):
+            if '=' not in item:
+                continue
+            platform, state = item.split('=', 1)
+            status, _, post_id = state.partition(':')
+            result[platform.strip().lower()] = {'status': status.strip(), 'post_id': post_id.strip()}
+        return result
+
+    @staticmethod
+    def format_platform_status(states: dict) -> str:
+        """Обратное к parse_platform_status."""
+        items = []
+        for platform, state in states.items():
+            value = state['status'] + (f":{state['post_id']}" if state.get('post_id') else '')
+            items.append(f"{platform}={value}")
+        return ';'.join(items)
+
+    def update_platform_status(self, row_number: int, states: dict) -> bool:
+        """Записать статусы по платформам (колонка I)."""
+        if not self.transport:
+            return False
+
+        try:
+            value = self.format_platform_status(states)
+            self.transport.execute(lambda service: service.spreadsheets().values().update(
+                spreadsheetId=self.sheet_id,
+                range=f'I{row_number}',
+                valueInputOption='RAW',
+                body={'values': [[value]]}
+            ))
+            return True
+
+        except Exception as e:
+            print(f"[ОШИБКА] Не удалось обновить статусы платформ: {e}")
+            return False
+
     def update_status(self, row_number: int, status: str, post_id: Optional[str] = None) -> bool:
         """Обновить статус задания после публикации."""
-        if not self.service:
+        if not self.transport:
             return False
 
         try:
             # Обновляем статус (колонка E)
-            self.service.spreadsheets().values().update(
+            self.transport.execute(lambda service: service.spreadsheets().values().update(
                 spreadsheetId=self.sheet_id,
                 range=f'E{row_number}',
                 valueInputOption='RAW',
                 body={'values': [[status]]}
-            ).execute()
+            ))
 
             # Если есть post_id, записываем его (колонка F)
             if post_id:
-                self.service.spreadsheets().values().update(
+                self.transport.execute(lambda service: service.spreadsheets().values().update(
                     spreadsheetId=self.sheet_id,
                     range=f'F{row_number}',
                     valueInputOption='RAW',
                     body={'values': [[post_id]]}
-                ).execute()
+                ))
 
             print(f"[OK] Строка {row_number}: статус обновлён на '{status}'")
             return True
@@ -0,0 +1,111 @@
+"""
+Транспорт для Google Sheets API.
+
+Клиент googleapiclient работает поверх httplib2, который не
+потокобезопасен, поэтому один клиент нельзя делить между потоками.
+Здесь каждый поток на время запроса получает собственный клиент
+из пула, а токен сервисного аккаунта общий и обновляется заранее.
+Документ discovery берётся из пакета, без запроса в сеть.
+"""
+
+import asyncio
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+import google_auth_httplib2
+import httplib2
+from google.oauth2 import service_account
+from googleapiclient import discovery_cache
+from googleapiclient.discovery import build, build_from_document
+
+
+@lru_cache(maxsize=None)
+def _discovery_document(api: str, version: str):
+    """Discovery-документ API из пакета googleapiclient (None, если его там нет)."""
+    return discovery_cache.get_static_doc(api, version)
+
+
+class SheetsTransport:
+    """Пул клиентов Sheets API с общим токеном."""
+
+    # Обновлять токен, если до истечения осталось меньше этого
+    REFRESH_MARGIN = timedelta(minutes=5)
+
+    def __init__(self, credentials_file: str, scopes: list, pool_size: int = 4, timeout: int = 30):
+        """
+        Args:
+            credentials_file: JSON ключ сервисного аккаунта
+            scopes: Области доступа
+            pool_size: Максимум одновременных запросов (и HTTP соединений)
+            timeout: Таймаут HTTP запроса, секунды
+        """
+        self.credentials = service_account.Credentials.from_service_account_file(
+            credentials_file,
+            scopes=scopes
+        )
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self._idle = []
+        self._pool_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(pool_size)
+        self._token_lock = threading.Lock()
+
+    def _ensure_token(self):
+        """Обновить токен заранее, чтобы потоки не обновляли его одновременно."""
+        with self._token_lock:
+            expiry = self.credentials.expiry
+            if self.credentials.valid and expiry and expiry - datetime.utcnow() > self.REFRESH_MARGIN:
+                return
+            request = google_auth_httplib2.Request(httplib2.Http(timeout=self.timeout))
+            self.credentials.refresh(request)
+
+    def _new_client(self):
+        """Новый клиент Sheets API со своим HTTP соединением."""
+        http = google_auth_httplib2.AuthorizedHttp(
+            self.credentials,
+            http=httplib2.Http(timeout=self.timeout)
+        )
+        document = _discovery_document('sheets', 'v4')
+        if document:
+            return build_from_document(document, http=http)
+        return build('sheets', 'v4', http=http, static_discovery=True)
+
+    @contextmanager
+    def client(self):
+        """
+        Взять клиент из пула на время работы.
+
+        Пример:
+            with transport.client() as service:
+                service.spreadsheets().values().get(...).execute()
+        """
+        self._slots.acquire()
+        try:
+            self._ensure_token()
+            with self._pool_lock:
+                client = self._idle.pop() if self._idle else None
+            if client is None:
+                client = self._new_client()
+            try:
+                yield client
+            finally:
+                with self._pool_lock:
+                    self._idle.append(client)
+        finally:
+            self._slots.release()
+
+    def execute(self, make_request):
+        """
+        Выполнить запрос на клиенте из пула.
+
+        Args:
+            make_request: Функция service -> HttpRequest
+        """
+        with self.client() as service:
+            return make_request(service).execute()
+
+    async def execute_async(self, make_request):
+        """Асинхронный вариант execute: запрос выполняется в пуле потоков."""
+        return await asyncio.to_thread(self.execute, make_request)
@@ -0,0 +1,144 @@
+"""
+Модуль параллельного подключения к сервисам.
+
+Каждый сервис подключается в своём потоке: connect() и затем лёгкая
+проверка (health probe). У сервиса есть таймаут и состояние готовности,
+поэтому задания для платформы можно начинать, как только готова именно
+она, не дожидаясь самого медленного сервиса (обычно это браузер Instagram).
+"""
+
+import threading
+import time
+from typing import Callable, Optional
+
+from services.metrics import metrics
+
+
+# Состояния сервиса
+PENDING = 'pending'   # Подключается
+READY = 'ready'       # Подключен и прошёл проверку
+FAILED = 'failed'     # Не удалось подключиться
+TIMEOUT = 'timeout'   # Не успел за отведённое время (может стать ready позже)
+
+
+class ServiceStartup:
+    """Подключение сервисов в фоне с таймаутами и состоянием готовности."""
+
+    def __init__(self):
+        self._services = {}
+        self._lock = threading.Lock()
+
+    def start(self, name: str, connect: Callable[[], bool],
+              probe: Optional[Callable[[], bool]] = None, timeout: float = 60):
+        """
+        Начать подключение сервиса в фоне. Уже готовый сервис только
+        проверяется заново и переподключается, если проверка не прошла.
+
+        Args:
+            name: Имя сервиса (для платформ - код платформы: tg, ig)
+            connect: Подключение, возвращает True при успехе
+            probe: Проверка после подключения, возвращает True, если сервис отвечает
+            timeout: Сколько ждать готовности, секунды
+        """
+        with self._lock:
+            service = self._services.get(name)
+            if service and service['state'] in (PENDING, TIMEOUT) and service['thread'].is_alive():
+                # Прошлое подключение ещё идёт - не запускаем второе
+                return
+            was_ready = bool(service) and service['state'] == READY
+            service = {
+                'state': PENDING,
+                'error': '',
+                'event': threading.Event(),
+                'started': time.monotonic(),
+                'deadline': time.monotonic() + timeout,
+            }
+            service['thread'] = threading.Thread(
+                target=self._connect,
+                args=(name, service, connect, probe, was_ready),
+                name=f"connect-{name}",
+                daemon=True,
+            )
+            self._services[name] = service
+        service['thread'].start()
+
+    def _connect(self, name: str, service: dict, connect: Callable[[], bool],
+                 probe: Optional[Callable[[], bool]], was_ready: bool = False):
+        with metrics.span('connect', platform=name) as span:
+            try:
+                ok = (was_ready and probe is not None and probe()) or (connect() and (probe is None or probe()))
+            except Exception as e:
+                service['error'] = str(e)
+                ok = False
+            if not ok:
+                span.fail()
+
+        elapsed = time.monotonic() - service['started']
+        with self._lock:
+            late = service['state'] == TIMEOUT
+            service['state'] = READY if ok else FAILED
+        service['event'].set()
+        metrics.gauge('service_ready', 1 if ok else 0, service=name)
+
+        if ok:
+            print(f"[OK] {name}: готов за {elapsed:.1f} сек." + (" (после таймаута)" if late else ""))
+        else:
+            print(f"[!] {name}: не подключен за {elapsed:.1f} сек. {service['error']}".rstrip())
+
+    def wait(self, name: str) -> bool:
+        """
+        Дождаться готовности сервиса (не дольше его таймаута).
+
+        Returns:
+            True, если сервис готов
+        """
+        service = self._services.get(name)
+        if service is None:
+            return False
+
+        if not service['event'].wait(max(0.0, service['deadline'] - time.monotonic())):
+            with self._lock:
+                if service['state'] == PENDING:
+                    service['state'] = TIMEOUT
+                    print(f"[!] {name}: не готов за отведённое время, продолжаем без него")
+        return service['state'] == READY
+
+    def join(self, name: str, timeout: float = 60) -> bool:
+        """
+        Дождаться окончания подключения сервиса (перед закрытием).
+
+        Returns:
+            False, если подключение не закончилось за timeout секунд
+        """
+        service = self._services.get(name)
+        if service is None or not service['thread'].is_alive():
+            return True
+        print(f"[!] {name}: подключение ещё идёт, ждём его окончания перед закрытием")
+        service['thread'].join(timeout)
+        if service['thread'].is_alive():
+            print(f"[!] {name}: подключение не закончилось за {timeout} сек., закрываем без него")
+            return False
+        return True
+
+    def started(self, name: str) -> bool:
+        """Подключение сервиса уже запускалось."""
+        return name in self._services
+
+    def ready(self, name: str) -> bool:
+        """Готов ли сервис прямо сейчас (без ожидания)."""
+        service = self._services.get(name)
+        return service is not None and service['state'] == READY
+
+    def available(self, name: str) -> bool:
+        """Готов или ещё может стать готовым до своего таймаута."""
+        service = self._services.get(name)
+        if service is None:
+            return False
+        if service['state'] == PENDING:
+            return time.monotonic() < service['deadline']
+        return service['state'] == READY
+
+    def states(self) -> dict:
+        """Состояния всех сервисов: {имя: состояние}."""
+        with self._lock:
+            return {name: service['state'] for name, service in self._services.items()}
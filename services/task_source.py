@@ -0,0 +1,524 @@
+"""
+Модуль источников заданий.
+
+Задание приходит из источника и статусы пишутся в него же (ключ задания
+'source'): конвейер AutoPost не знает, откуда задание.
+
+- SheetsTaskSource - строки Google Sheets с арендой (несколько воркеров
+  на одну таблицу);
+- FileTaskSource - файл JSONL или CSV (режим --source) для больших пачек и
+  работы без квот Sheets API;
+- JobTaskSource - задания из HTTP API (режим --schedule).
+
+Файл читается построчно, в памяти одновременно только задания текущей
+пачки, поэтому размер файла не важен.
+
+Рядом с файлом ведутся:
+- <файл>.checkpoint - смещение в байтах, до которого все задания
+  выполнены: после перезапуска чтение продолжается с него;
+- <файл>.results.jsonl - журнал результатов (только дописывается):
+  статусы по платформам и итоговый статус каждого задания. Задания после
+  контрольной точки, уже выполненные до перезапуска, берутся из журнала
+  и не публикуются повторно.
+
+Отложенное задание (бюджет, платформа не подключена) не держит
+контрольную точку: оно записывается в журнал как deferred и читается
+заново в начале следующего запуска.
+
+Поля задания те же, что в таблице и в HTTP API: project, topic
+(обязательные), platforms, image, priority, status, platform_status, id.
+"""
+
+import csv
+import json
+import os
+import threading
+from abc import ABC, abstractmethod
+from datetime import datetime
+from itertools import islice
+from typing import Callable, Iterator, Optional
+
+from services.api import JobQueue
+from services.sheets import SheetsService
+
+
+# Итоговые статусы задания (после них задание не повторяется)
+FINAL_STATUSES = ('done', 'error', 'duplicate')
+# Задание отложено - повторить при следующем запуске
+DEFERRED = 'deferred'
+
+
+class TaskSource(ABC):
+    """
+    Источник заданий для AutoPost.run.
+
+    Задание - словарь с ключами project, topic, platforms, image, priority,
+    platform_status. Источник сам решает, как отмечать выполнение.
+    """
+
+    name = ''
+    # Имя для подключения через ServiceStartup (ключ CONNECT_TIMEOUTS)
+    service = 'source'
+    # Сколько заданий обрабатывать за раз
+    batch = 100
+
+    @abstractmethod
+    def connect(self) -> bool:
+        """Открыть источник. Returns: True при успехе."""
+
+    @abstractmethod
+    def tasks(self, select: Callable[[list, int], list] = None, readonly: bool = False) -> Iterator[dict]:
+        """
+        Задания к выполнению (лениво, по одному).
+
+        Args:
+            select: Выбор заданий пачки из доступных (для источников, которые выбирают сами)
+            readonly: Только прочитать (тестовый режим), не забирая задания в работу
+        """
+
+    def batches(self, select: Callable[[list, int], list] = None, readonly: bool = False) -> Iterator[list]:
+        """Задания пачками по batch: следующая пачка читается, когда взята текущая."""
+        tasks = self.tasks(select, readonly)
+        while True:
+            batch = list(islice(tasks, self.batch))
+            if not batch:
+                return
+            yield batch
+
+    def renew(self, task: dict) -> bool:
+        """Задание всё ещё за этим воркером (False - его забрал другой)."""
+        return True
+
+    @abstractmethod
+    def update_platform_status(self, task: dict, states: dict) -> bool:
+        """Записать статусы по платформам {platform: {'status', 'post_id'}}."""
+
+    @abstractmethod
+    def update_status(self, task: dict, status: str, post_id: Optional[str] = None) -> bool:
+        """Записать итоговый статус задания."""
+
+    @abstractmethod
+    def release(self, task: dict) -> bool:
+        """Задание не выполнено (отложено) - вернуть его к следующему запуску."""
+
+
+class SheetsTaskSource(TaskSource):
+    """Строки Google Sheets: задания берутся в аренду пачками по batch."""
+
+    service = 'sheets'
+
+    def __init__(self, sheets: SheetsService, worker_id: str, lease_seconds: int, batch: int,
+                 projects: list = None, shard: str = ''):
+        """
+        Args:
+            sheets: Сервис таблицы
+            worker_id: Имя воркера (в статусе-аренде строки)
+            lease_seconds: Срок аренды
+            batch: Сколько строк брать за раз
+            projects: Проекты воркера (пусто - все)
+            shard: Шард проектов "i/n"
+        """
+        self.sheets = sheets
+        self.name = 'Google Sheets'
+        self.worker_id = worker_id
+        self.lease_seconds = lease_seconds
+        self.batch = batch
+        self.projects = projects
+        self.shard = shard
+
+    def connect(self) -> bool:
+        """Подключиться к таблице (уже открытое подключение только проверяется)."""
+        if self.sheets.transport and self.sheets.health_check():
+            return True
+        return self.sheets.connect() and self.sheets.health_check()
+
+    def tasks(self, select: Callable[[list, int], list] = None, readonly: bool = False) -> Iterator[dict]:
+        for batch in self.batches(select, readonly):
+            yield from batch
+
+    def batches(self, select: Callable[[list, int], list] = None, readonly: bool = False) -> Iterator[list]:
+        """
+        Взятые в аренду пачки строк (следующая берётся, когда запрошена).
+        В тестовом режиме - все pending строки одной пачкой, без аренды.
+        """
+        if readonly:
+            tasks = self.sheets.get_pending_tasks()
+            if tasks:
+                yield tasks
+            return
+
+        # Строки, выданные в этом запуске (в т.ч. возвращённые в очередь), повторно не берём
+        seen = set()
+        while True:
+            tasks = self.sheets.claim_tasks(
+                self.worker_id, self.batch, self.lease_seconds,
+                projects=self.projects, shard=self.shard, exclude=seen, select=select,
+            )
+            if not tasks:
+                return
+            seen.update(task['row_number'] for task in tasks)
+            yield tasks
+
+    def renew(self, task: dict) -> bool:
+        """Продлить аренду строки."""
+        return self.sheets.renew_lease(task, self.worker_id, self.lease_seconds)
+
+    def update_platform_status(self, task: dict, states: dict) -> bool:
+        return self.sheets.update_platform_status(task['row_number'], states)
+
+    def update_status(self, task: dict, status: str, post_id: Optional[str] = None) -> bool:
+        """Записать итоговый статус строки (аренда на этом заканчивается)."""
+        task['lease'] = None
+        return self.sheets.update_status(task['row_number'], status, post_id)
+
+    def release(self, task: dict) -> bool:
+        """Вернуть строку в pending, если она ещё в нашей аренде."""
+        return self.sheets.release_lease(task)
+
+
+class JobTaskSource(TaskSource):
+    """Задания из HTTP API, время публикации которых наступило."""
+
+    def __init__(self, queue: JobQueue, retry_delay: float, test_mode: bool = False):
+        """
+        Args:
+            queue: Очередь заданий API
+            retry_delay: Через сколько секунд повторить отложенное задание
+            test_mode: Тестовый режим - задания завершаются статусом tested
+        """
+        self.queue = queue
+        self.name = 'HTTP API'
+        self.retry_delay = retry_delay
+        self.test_mode = test_mode
+
+    def connect(self) -> bool:
+        return True
+
+    def tasks(self, select: Callable[[list, int], list] = None, readonly: bool = False,
+              wait: float = 0) -> Iterator[dict]:
+        """
+        Args:
+            wait: Сколько ждать первого задания, секунды
+        """
+        count = 0
+        while True:
+            job = self.queue.next_due(0 if count else wait)
+            if job is None:
+                return
+            count += 1
+            yield {
+                'job_id': job['id'],
+                'project': job['project'],
+                'topic': job['topic'],
+                'platforms': job['platforms'],
+                'image': job['image'],
+                'priority': job['priority'],
+                'platform_status': job['platform_status'],
+            }
+
+    def update_platform_status(self, task: dict, states: dict) -> bool:
+        self.queue.update(task['job_id'], platform_status=states)
+        return True
+
+    def update_status(self, task: dict, status: str, post_id: Optional[str] = None) -> bool:
+        if self.test_mode:
+            status = 'tested'
+        self.queue.finish(task['job_id'], status, post_id, error=task.get('error', ''))
+        return True
+
+    def release(self, task: dict) -> bool:
+        """Отложить задание до следующего запуска по расписанию (в тестовом режиме - завершить)."""
+        if self.test_mode:
+            self.queue.finish(task['job_id'], 'tested')
+        else:
+            self.queue.retry(task['job_id'], self.retry_delay, error='отложено')
+        return True
+
+
+class FileTaskSource(TaskSource):
+    """Задания из файла JSONL или CSV с контрольной точкой и журналом результатов."""
+
+    FORMATS = {'.jsonl': 'jsonl', '.ndjson': 'jsonl', '.csv': 'csv'}
+
+    def __init__(self, path: str, batch: int = 100, checkpoint_path: str = '', results_path: str = ''):
+        """
+        Args:
+            path: Файл заданий (.jsonl, .ndjson или .csv)
+            batch: Сколько заданий читать за раз
+            checkpoint_path: Файл контрольной точки (по умолчанию <файл>.checkpoint)
+            results_path: Журнал результатов (по умолчанию <файл>.results.jsonl)
+        """
+        self.path = path
+        self.name = os.path.basename(path)
+        self.batch = batch
+        self.format = self.FORMATS.get(os.path.splitext(path)[1].lower(), '')
+        self.checkpoint_path = checkpoint_path or f"{path}.checkpoint"
+        self.results_path = results_path or f"{path}.results.jsonl"
+        self._lock = threading.Lock()
+        # Контрольная точка при запуске: (смещение, номер строки)
+        self._start = (0, 0)
+        # Выданные и ещё не выполненные задания: смещение -> номер строки
+        # (в порядке чтения, первое - новая контрольная точка)
+        self._open = {}
+        # Докуда файл прочитан: (смещение, номер строки)
+        self._position = (0, 0)
+        self._checkpoint = (0, 0)
+        # Результаты из журнала для заданий после контрольной точки: смещение -> запись
+        self._results = {}
+        # Отложенные задания из журнала: смещение -> (номер строки, статусы платформ)
+        self._deferred = {}
+
+    def connect(self) -> bool:
+        """Проверить файл, прочитать контрольную точку и журнал результатов."""
+        if not self.format:
+            print(f"[ОШИБКА] {self.name}: поддерживаются только .jsonl, .ndjson и .csv")
+            return False
+        if not os.path.isfile(self.path):
+            print(f"[ОШИБКА] Файл заданий не найден: {self.path}")
+            return False
+
+        self._start = self._load_checkpoint()
+        self._position = self._checkpoint = self._start
+        self._results, self._deferred = self._load_results(self._start[0])
+        self._open = {}
+
+        offset, line = self._start
+        if offset:
+            print(f"[OK] {self.name}: продолжаем со строки {line + 1} (байт {offset})")
+        else:
+            print(f"[OK] Источник заданий: {self.name}")
+        if self._deferred:
+            print(f"[OK] {self.name}: отложенных заданий: {len(self._deferred)}")
+        return True
+
+    def _load_checkpoint(self) -> tuple[int, int]:
+        if not os.path.exists(self.checkpoint_path):
+            return 0, 0
+        try:
+            with open(self.checkpoint_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            offset, line = int(data['offset']), int(data['line'])
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"[!] {self.name}: контрольная точка повреждена ({e}), читаем с начала")
+            return 0, 0
+
+        if offset > os.path.getsize(self.path):
+            print(f"[!] {self.name}: файл короче контрольной точки (заменён?), читаем с начала")
+            return 0, 0
+        return offset, line
+
+    def _load_results(self, offset: int) -> tuple[dict, dict]:
+        """
+        Последняя запись журнала для каждого задания после контрольной
+        точки и все задания, последняя запись которых - deferred.
+        """
+        results = {}
+        deferred = {}
+        if not os.path.exists(self.results_path):
+            return results, deferred
+        with open(self.results_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # Недописанная строка при аварийной остановке
+                    continue
+                if entry.get('file') != self.name or 'offset' not in entry:
+                    continue
+                if entry['status'] == DEFERRED:
+                    deferred[entry['offset']] = (entry['line'] - 1, entry.get('platform_status') or {})
+                else:
+                    deferred.pop(entry['offset'], None)
+                if entry['offset'] >= offset:
+                    results[entry['offset']] = entry
+        return results, deferred
+
+    # --- Чтение ---
+
+    def tasks(self, select: Callable[[list, int], list] = None, readonly: bool = False) -> Iterator[dict]:
+        """
+        Отложенные в прошлых запусках задания, затем задания с контрольной
+        точки до конца файла. Строки с итоговым статусом (в файле или в
+        журнале) и некорректные строки пропускаются. Порядок - как в файле
+        (select не используется); без записи статусов контрольная точка
+        не двигается, поэтому readonly тоже не нужен.
+        """
+        reader = self._read_csv if self.format == 'csv' else self._read_jsonl
+
+        # Отложенные задания стоят до контрольной точки - её не двигают
+        for offset, (line, platform_status) in sorted(self._deferred.items()):
+            for _, _, _, _, data in reader(offset, line):
+                task = self._parse(data, line)
+                if task:
+                    task.update(source_offset=offset, source_line=line)
+                    task['platform_status'] = platform_status or task['platform_status']
+                    yield task
+                break
+        self._deferred = {}
+
+        skipped = 0
+        for offset, line, end, end_line, data in reader(*self._start):
+            task = self._parse(data, line)
+            if task:
+                task.update(source_offset=offset, source_line=line)
+                result = self._results.pop(offset, None)
+                if result and result.get('status') in FINAL_STATUSES + (DEFERRED,):
+                    # Выполнено или отложено (тогда уже выдано выше)
+                    task = None
+                elif result:
+                    # Частично опубликовано до перезапуска
+                    task['platform_status'] = result.get('platform_status') or {}
+
+            with self._lock:
+                if task:
+                    self._open[offset] = line
+                self._position = (end, end_line)
+            if task:
+                yield task
+            else:
+                skipped += 1
+
+        if skipped:
+            print(f"[OK] {self.name}: пропущено строк (выполнены или некорректны): {skipped}")
+
+    @staticmethod
+    def _read_lines(f, offset: int, line: int) -> Iterator[tuple[int, int, int, bytes]]:
+        """(начало, номер строки, конец, байты) начиная со смещения offset."""
+        f.seek(offset)
+        while True:
+            raw = f.readline()
+            if not raw:
+                return
+            end = f.tell()
+            yield offset, line, end, raw
+            offset, line = end, line + 1
+
+    def _read_jsonl(self, offset: int, line: int) -> Iterator[tuple[int, int, int, int, Optional[dict]]]:
+        with open(self.path, 'rb') as f:
+            for offset, line, end, raw in self._read_lines(f, offset, line):
+                if not raw.strip():
+                    yield offset, line, end, line + 1, None
+                    continue
+                try:
+                    data = json.loads(raw)
+                except ValueError as e:
+                    print(f"[!] {self.name}, строка {line + 1}: неверный JSON ({e})")
+                    data = None
+                yield offset, line, end, line + 1, data
+
+    def _read_csv(self, offset: int, line: int) -> Iterator[tuple[int, int, int, int, Optional[dict]]]:
+        with open(self.path, 'rb') as f:
+            header = f.readline()
+            columns = [c.strip().lower() for c in next(csv.reader([header.decode('utf-8-sig')]), [])]
+            if offset < f.tell():
+                offset, line = f.tell(), 1
+
+            lines = self._read_lines(f, offset, line)
+            for offset, line, end, raw in lines:
+                end_line = line + 1
+                # Поле в кавычках может занимать несколько строк файла
+                while raw.count(b'"') % 2:
+                    try:
+                        _, last, end, more = next(lines)
+                    except StopIteration:
+                        break
+                    raw += more
+                    end_line = last + 1
+                row = next(csv.reader([raw.decode('utf-8')]), [])
+                yield offset, line, end, end_line, dict(zip(columns, row)) if any(row) else None
+
+    def _parse(self, data, line: int) -> Optional[dict]:
+        """Строка файла -> задание (None - пропустить)."""
+        if not isinstance(data, dict):
+            return None
+
+        project = str(data.get('project') or '').strip()
+        topic = str(data.get('topic') or '').strip()
+        if not project or not topic:
+            print(f"[!] {self.name}, строка {line + 1}: нет project или topic")
+            return None
+
+        status = str(data.get('status') or 'pending').strip().lower()
+        if status != 'pending':
+            return None
+
+        platforms = data.get('platforms') or ['tg']
+        if isinstance(platforms, str):
+            platforms = platforms.split(',')
+
+        platform_status = data.get('platform_status') or {}
+        if isinstance(platform_status, str):
+            platform_status = SheetsService.parse_platform_status(platform_status)
+
+        return {
+            'task_id': str(data.get('id') or ''),
+            'project': project,
+            'topic': topic,
+            'platforms': [str(p) for p in platforms],
+            'image': str(data.get('image') or '').strip().lower(),
+            'priority': str(data.get('priority') or 'normal').strip().lower(),
+            'platform_status': platform_status,
+        }
+
+    # --- Результаты ---
+
+    def update_platform_status(self, task: dict, states: dict) -> bool:
+        return self._log(task, 'processing', platform_status=states)
+
+    def update_status(self, task: dict, status: str, post_id: Optional[str] = None) -> bool:
+        """Записать итоговый статус в журнал и сдвинуть контрольную точку."""
+        if not self._log(task, status, post_id=post_id):
+            return False
+        self._close(task)
+        return True
+
+    def release(self, task: dict) -> bool:
+        """Отложить задание: в журнал как deferred, контрольная точка идёт дальше."""
+        if not self._log(task, DEFERRED, platform_status=task.get('platform_status') or {}):
+            return False
+        self._close(task)
+        return True
+
+    def _close(self, task: dict):
+        """Задание больше не держит контрольную точку."""
+        with self._lock:
+            self._open.pop(task['source_offset'], None)
+            checkpoint = next(iter(self._open.items()), self._position)
+            if checkpoint == self._checkpoint:
+                return
+            self._checkpoint = checkpoint
+            try:
+                self._save_checkpoint(*checkpoint)
+            except OSError as e:
+                print(f"[ОШИБКА] Не удалось сохранить контрольную точку: {e}")
+
+    def _log(self, task: dict, status: str, **fields) -> bool:
+        entry = {
+            'time': datetime.now().isoformat(timespec='seconds'),
+            'file': self.name,
+            'offset': task['source_offset'],
+            'line': task['source_line'] + 1,
+            'id': task.get('task_id', ''),
+            'project': task['project'],
+            'topic': task['topic'],
+            'status': status,
+            **fields,
+        }
+        try:
+            with self._lock:
+                with open(self.results_path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            return True
+        except OSError as e:
+            print(f"[ОШИБКА] Не удалось записать результат задания: {e}")
+            return False
+
+    def _save_checkpoint(self, offset: int, line: int):
+        data = {
+            'offset': offset,
+            'line': line,
+            'updated': datetime.now().isoformat(timespec='seconds'),
+        }
+        with open(f"{self.checkpoint_path}.tmp", 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(f"{self.checkpoint_path}.tmp", self.checkpoint_path)
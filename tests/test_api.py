@@ -0,0 +1,22 @@
+"""Тесты очереди заданий HTTP API."""
+
+import pytest
+
+from services.api import JobError, JobQueue
+
+
+def test_unknown_platform_is_rejected():
+    queue = JobQueue()
+    with pytest.raises(JobError, match='xx'):
+        queue.submit([{'project': 'p', 'topic': 't', 'platforms': ['tg', 'xx']}])
+    assert queue.recent() == []
+
+    job = queue.submit([{'project': 'p', 'topic': 't', 'platforms': 'TG, ig,tt'}])[0]
+    assert job['platforms'] == ['tg', 'ig', 'tt']
+
+
+def test_recent_limit():
+    queue = JobQueue()
+    queue.submit([{'project': 'p', 'topic': f't{i}'} for i in range(3)])
+    assert queue.recent(limit=0) == []
+    assert [j['topic'] for j in queue.recent(limit=2)] == ['t1', 't2']
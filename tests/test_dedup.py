@@ -0,0 +1,52 @@
+"""Тесты поиска перефразированных тем."""
+
+from config.settings import DEDUP_THRESHOLD
+from services.dedup import TopicIndex, _stem
+
+
+def score(left: str, right: str) -> float:
+    index = TopicIndex('unused.jsonl')
+    return index.similarity(index.signature(left), index.signature(right))
+
+
+def test_stem_is_same_in_all_cases():
+    for forms in (
+        'отдых отдыха отдыху отдыхом отдыхе',
+        'место места мест местам местах',
+        'турция турции турцию турцией',
+        'запись записи записью записей',
+    ):
+        assert len({_stem(word) for word in forms.split()}) == 1, forms
+
+
+def test_rewordings_are_duplicates():
+    for left, right in (
+        ('Топ-5 мест для отдыха в Турции', 'Лучшие пляжи Турции'),
+        ('Топ-5 мест для отдыха в Турции', 'Где отдохнуть в Турции: топ-5 мест'),
+        ('Лучшие пляжи Турции', 'Где отдохнуть в Турции: топ-5 мест'),
+        ('Отдых в Турции', 'Отдыха в Турции'),
+    ):
+        assert score(left, right) >= DEDUP_THRESHOLD, (left, right)
+
+
+def test_other_topics_are_not_duplicates():
+    for left, right in (
+        ('Топ-5 мест для отдыха в Турции', 'Топ-5 мест для отдыха в Греции'),
+        ('Лучшие пляжи Турции', 'Лучшие пляжи Греции'),
+        ('Топ-5 мест для отдыха в Турции', 'Как открыть ИП в 2024 году'),
+    ):
+        assert score(left, right) < DEDUP_THRESHOLD, (left, right)
+
+
+def test_find_uses_project_and_file(tmp_path):
+    path = str(tmp_path / 'topics.jsonl')
+    index = TopicIndex(path, DEDUP_THRESHOLD)
+    index.add('travel', 'Топ-5 мест для отдыха в Турции', {'tg': {'text': 'Пост'}})
+
+    found = index.find('travel', 'Лучшие пляжи Турции')
+    assert found and found[0]['texts'] == {'tg': 'Пост'}
+    assert index.find('other', 'Лучшие пляжи Турции') is None
+
+    reloaded = TopicIndex(path, DEDUP_THRESHOLD)
+    assert reloaded.load() == 1
+    assert reloaded.find('travel', 'Где отдохнуть в Турции: топ-5 мест')